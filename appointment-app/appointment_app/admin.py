@@ -1,6 +1,11 @@
 from django.contrib import admin
-from appointment_app.models import Appointment, Times
+from appointment_app.models import Appointment, ArchivedAppointment, OutboxMessage, Resource, ScheduleException, ScheduleTemplate, Times, WaitlistEntry
 
 admin.site.register(Appointment)
 admin.site.register(Times)
-
+admin.site.register(OutboxMessage)
+admin.site.register(ScheduleTemplate)
+admin.site.register(ScheduleException)
+admin.site.register(Resource)
+admin.site.register(WaitlistEntry)
+admin.site.register(ArchivedAppointment)
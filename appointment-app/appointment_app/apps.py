@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AppointmentAppConfig(AppConfig):
     name = 'appointment_app'
+
+    def ready(self):
+        from appointment_app import signals # noqa: F401 connects the receivers
@@ -0,0 +1,67 @@
+from django.db import transaction
+from appointment_app import cache
+from appointment_app.models import Appointment, ArchivedAppointment, Times
+from appointment_app.signals import batched_tombstones, quiet_deletes
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# the same rows as .values(*APPOINTMENT_VALUES), see archived_row()
+ARCHIVE_VALUES = ('id', 'filled', 'client__username', 'times_id', 'time_start', 'time_end', 'date_start', 'resource_id')
+
+
+def archived_row(row):
+    """
+    Turn a row from ArchivedAppointment.objects.values(*ARCHIVE_VALUES) into an APPOINTMENT_VALUES
+    row, for lean_appointment().
+    """
+    return {'id': row['id'], 'filled': row['filled'], 'client__username': row['client__username'],
+            'times__id': row['times_id'], 'times__time_start': row['time_start'], 'times__time_end': row['time_end'],
+            'times__date_start': row['date_start'], 'times__resource_id': row['resource_id']}
+
+
+def archive_chunks(before, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Move the slots that ended before `before` and their appointments to ArchivedAppointment,
+    chunk_size slots per transaction, yielding (appointments, slots) as each chunk commits.
+
+    Slots are taken in (time_end, id) order from the times_time_end index. Each chunk's slots are
+    gone once it commits, so the next one starts at the last time_end seen rather than rescanning
+    from the oldest. The changes feed reports them deleted like any other rows, so a client that
+    syncs incrementally drops them as one that starts over never gets them.
+    """
+    since = None
+    while True:
+        with transaction.atomic():
+            slots = Times.objects.filter(time_end__lt=before)
+            if since is not None:
+                slots = slots.filter(time_end__gte=since)
+            chunk = list(slots.order_by('time_end', 'id').values_list('id', 'time_end')[:chunk_size])
+            if not chunk:
+                return
+            slot_ids = [slot_id for slot_id, _ in chunk]
+            since = chunk[-1][1]
+            rows = Appointment.objects.filter(times_id__in=slot_ids).values_list(
+                'id', 'times_id', 'client_id', 'filled', 'times__date_start', 'times__time_start', 'times__time_end', 'times__resource_id')
+            archived = ArchivedAppointment.objects.bulk_create(
+                [ArchivedAppointment(id=appointment_id, times_id=times_id, client_id=client_id, filled=filled, date_start=date_start,
+                                     time_start=time_start, time_end=time_end, resource_id=resource_id)
+                 for appointment_id, times_id, client_id, filled, date_start, time_start, time_end, resource_id in rows],
+                batch_size=500)
+            # archiving isn't a cancellation: no slot events or waitlist promotion, and the cache is
+            # invalidated once per chunk. The appointments, reminders and waitlist entries go with
+            # their slots, the tombstones share one seq, which moves the list ETags on too.
+            with quiet_deletes(), batched_tombstones():
+                Times.objects.filter(id__in=slot_ids).delete()
+            cache.invalidate()
+        yield len(archived), len(slot_ids)
+
+
+def archive_past(before, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Run archive_chunks() to the end, returns how many (appointments, slots) were moved.
+    """
+    appointments = slots = 0
+    for archived, deleted in archive_chunks(before, chunk_size):
+        appointments += archived
+        slots += deleted
+    return appointments, slots
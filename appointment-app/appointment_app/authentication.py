@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils import timezone
+from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
+from appointment_app.models import RevokedToken
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+SALT = 'appointment_app.token.'
+
+_revoked = set()
+_revoked_loaded_at = None
+_revoked_lock = threading.Lock()
+
+
+def token_lifetime(kind):
+    if kind == ACCESS:
+        return getattr(settings, 'APPOINTMENT_ACCESS_TOKEN_SECONDS', 300)
+    return getattr(settings, 'APPOINTMENT_REFRESH_TOKEN_SECONDS', 14 * 24 * 3600)
+
+
+def issue_token(user, kind):
+    """
+    A signed, timestamped token for `user`. Access tokens carry what the views need from the user
+    so checking one doesn't touch the database.
+    """
+    payload = {'jti': uuid.uuid4().hex, 'uid': user.pk}
+    if kind == ACCESS:
+        payload.update(username=user.username, email=user.email, staff=user.is_staff)
+    return signing.dumps(payload, salt=SALT + kind)
+
+
+def issue_tokens(user):
+    return {'access': issue_token(user, ACCESS), 'refresh': issue_token(user, REFRESH), 'expires_in': token_lifetime(ACCESS)}
+
+
+def read_token(token, kind):
+    """
+    The payload of a valid, unexpired and unrevoked token of `kind`, else AuthenticationFailed.
+    """
+    try:
+        payload = signing.loads(token, salt=SALT + kind, max_age=token_lifetime(kind))
+    except signing.SignatureExpired:
+        raise AuthenticationFailed('Token has expired.', code='token_expired')
+    except signing.BadSignature:
+        raise AuthenticationFailed('Invalid token.', code='token_invalid')
+    if is_revoked(payload['jti']):
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+    return payload
+
+
+def revoked_ids():
+    """
+    The revoked token ids, read from the database at most every APPOINTMENT_REVOCATION_CACHE_SECONDS.
+
+    Revocations made in this process count at once, ones made by another process once this
+    process reloads.
+    """
+    global _revoked, _revoked_loaded_at
+    ttl = getattr(settings, 'APPOINTMENT_REVOCATION_CACHE_SECONDS', 30)
+    with _revoked_lock:
+        if _revoked_loaded_at is None or time.monotonic() - _revoked_loaded_at > ttl:
+            _revoked = set(RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', flat=True))
+            _revoked_loaded_at = time.monotonic()
+        return _revoked
+
+
+def is_revoked(jti):
+    return jti in revoked_ids()
+
+
+def revoke(token, kind):
+    """
+    Revoke a valid token, until it would have expired anyway.
+    """
+    return revoke_payload(read_token(token, kind), kind)
+
+
+def revoke_payload(payload, kind):
+    """
+    Revoke the token `payload` was read from, False if it was already revoked (by another process).
+    """
+    now = timezone.now()
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+    _, created = RevokedToken.objects.get_or_create(
+        jti=payload['jti'], defaults={'expires_at': now + timezone.timedelta(seconds=token_lifetime(kind))})
+    with _revoked_lock:
+        _revoked.add(payload['jti'])
+    return created
+
+
+def forget_revocations():
+    """
+    Drop the in-memory revocation list so the next check reloads it.
+    """
+    global _revoked, _revoked_loaded_at
+    with _revoked_lock:
+        _revoked, _revoked_loaded_at = set(), None
+
+
+def refresh_tokens(token):
+    """
+    Swap a refresh token for a new access and refresh token pair, the old refresh token is revoked.
+
+    This is where a deactivated or deleted user is caught, so an access token outlives that by at
+    most APPOINTMENT_ACCESS_TOKEN_SECONDS.
+    """
+    payload = read_token(token, REFRESH)
+    user = get_user_model().objects.filter(pk=payload['uid'], is_active=True).first()
+    if user is None:
+        raise AuthenticationFailed('User inactive or deleted.', code='user_inactive')
+    if not revoke_payload(payload, REFRESH): # two refreshes raced, only the first gets new tokens
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+    return issue_tokens(user)
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authorization: Bearer <access token>, from POST /auth/token/.
+
+    Costs an HMAC check and a set lookup, no password hash and no session or user query. The user
+    is rebuilt from the token without being loaded, it has the id, username, email and is_staff
+    the views and permissions use.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid token header.', code='token_invalid')
+        payload = read_token(header[1].decode('latin-1'), ACCESS)
+        user = get_user_model()(pk=payload['uid'], username=payload['username'], email=payload['email'],
+                                is_staff=payload['staff'], is_active=True)
+        return user, payload
+
+    def authenticate_header(self, request):
+        return f'{self.keyword} realm="api"'
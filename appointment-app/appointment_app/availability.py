@@ -0,0 +1,105 @@
+import datetime
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+from appointment_app.broker import get_broker
+from appointment_app.capacity import around, slot_capacity, slot_indexes, slot_interval
+from appointment_app.models import Times
+from appointment_app.schedules import current_schedule, legacy_slot_offered, slot_order, template_slots
+from appointment_app.serializers import TimesSerializer
+
+MAX_AVAILABILITY_DAYS = 92
+
+SLOT_TAKEN = 'taken'
+SLOT_FREED = 'freed'
+
+
+def slot_rows(date_from, date_to):
+    """
+    Every Times between date_from and date_to (inclusive) with its resource and the number of
+    appointments `booked` on it, in date and time order.
+    """
+    return (Times.objects
+            .filter(date_start__gte=date_from, date_start__lte=date_to)
+            .select_related('resource')
+            .annotate(booked=Count('times'))
+            .order_by('date_start', 'time_start'))
+
+
+def free_slots(date_from, date_to):
+    """
+    Return the slots between date_from and date_to (inclusive) that still have room, in date and
+    time order.
+
+    These are the Times rows plus the slots the schedule templates offer that have no row yet,
+    as unsaved Times (id None, booked by date_start, time_start and resource). A row is only
+    returned while its start time is still offered, by its template or in CHOICES_TIME_START for
+    the rows that predate templates, and isn't closed by a ScheduleException.
+
+    Room is worked out per calendar with an IntervalIndex of its bookings, which come with the rows
+    (the day either side too, for slots that run past midnight), so a slot is left out when its
+    resource's capacity is used up by overlapping appointments.
+    """
+    schedule = current_schedule()
+    closures = schedule[1]
+    offered = template_slots(date_from, date_to, schedule)
+    rows = list(slot_rows(*around([date_from, date_to])))
+    indexes = slot_indexes(rows)
+    candidates = []
+    for row in rows:
+        if not date_from <= row.date_start <= date_to:
+            continue
+        from_template = offered.pop((row.resource_id, row.date_start, row.time_start), None) is not None
+        if from_template or legacy_slot_offered(row, closures):
+            candidates.append(row)
+    candidates.extend(offered.values())
+    free = []
+    for slot in sorted(candidates, key=slot_order):
+        if slot.resource_id is not None and not slot.resource.active:
+            continue
+        index = indexes.get(slot.resource_id)
+        if index is None or index.fits(*slot_interval(slot), slot_capacity(slot)):
+            free.append(slot)
+    return free
+
+
+def free_slots_by_date(date_from, date_to):
+    """
+    The serialized free slots between two dates, grouped as {date: [slot, ...]}.
+    """
+    by_date = {}
+    for slot in TimesSerializer(free_slots(date_from, date_to), many=True).data:
+        by_date.setdefault(datetime.date.fromisoformat(slot['date_start']), []).append(slot)
+    return by_date
+
+
+def availability_window(date_from=None, date_to=None):
+    """
+    Fill in the defaults for an availability query (from today for a week) and check its size.
+    """
+    if date_from is None:
+        date_from = datetime.date.today()
+    if date_to is None:
+        date_to = date_from + datetime.timedelta(days=6)
+    if date_from > date_to:
+        raise ValidationError({'date_to': 'date_to must not be before date_from.'})
+    if (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+        raise ValidationError({'date_to': f'Availability can be asked for at most {MAX_AVAILABILITY_DAYS} days at a time.'})
+    return date_from, date_to
+
+
+def announce(event, times_ids):
+    """
+    Publish a SLOT_TAKEN or SLOT_FREED event for each slot once the current transaction commits,
+    so subscribers never hear about a booking that gets rolled back.
+    """
+    times_ids = [times_id for times_id in times_ids if times_id is not None]
+    if times_ids:
+        transaction.on_commit(lambda: publish_slots(event, times_ids))
+
+
+def publish_slots(event, times_ids):
+    # the slots go out as /availability/ lists them, a slot deleted since is skipped
+    broker = get_broker()
+    for slot in TimesSerializer(Times.objects.filter(id__in=times_ids).order_by('date_start', 'time_start'), many=True).data:
+        broker.publish(event, slot)
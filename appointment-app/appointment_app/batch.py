@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from appointment_app import cache
+from appointment_app.availability import SLOT_FREED, SLOT_TAKEN, announce
+from appointment_app.capacity import check_capacity
+from appointment_app.locking import lock_slots
+from appointment_app.models import Appointment, next_sync_seq
+from appointment_app.outbox import queue_mail
+from appointment_app.schedules import current_schedule, materialize_slot, slot_offered
+from appointment_app.signals import batched_tombstones
+from appointment_app.waitlist import lock_waitlists, promote_waiters
+from appointment_app.serializers import BatchOperationSerializer
+
+
+def describe(times):
+    return f"{times.date_start} at {times.time_start}"
+
+
+def materialize_id(times_data):
+    slot = materialize_slot(times_data['date_start'], times_data['time_start'], times_data.get('resource_id'))
+    if slot is None:
+        raise ValidationError({'operations': [f"No slot is offered on {times_data['date_start']} at {times_data['time_start']}."]})
+    return slot.id
+
+
+def apply_batch(user, operations):
+    """
+    Apply validated create/update/delete operations for one user in a single transaction.
+
+    The target slots are locked and the ownership of every appointment is checked with one query
+    each, the changes go out as one DELETE, one bulk UPDATE and one bulk INSERT, and the user gets
+    a single digest email for the lot. Returns (created, updated, deleted_ids). Slots given by
+    date_start and time_start instead of an id are saved first if a schedule template offers them,
+    and slots given up go to their waitlists.
+    """
+    creates = [operation for operation in operations if operation['op'] == BatchOperationSerializer.CREATE]
+    updates = [operation for operation in operations if operation['op'] == BatchOperationSerializer.UPDATE]
+    deletes = [operation for operation in operations if operation['op'] == BatchOperationSerializer.DELETE]
+
+    with transaction.atomic():
+        for operation in creates + updates:
+            if 'times' in operation and operation['times'].get('id') is None:
+                operation['times']['id'] = materialize_id(operation['times'])
+        target_ids = {operation['times']['id'] for operation in creates + updates if operation.get('times', {}).get('id') is not None}
+        slots = lock_slots(target_ids)
+        missing = target_ids - set(slots)
+        if missing:
+            raise ValidationError({'operations': [f"Slot {times_id} does not exist." for times_id in sorted(missing)]})
+
+        appointment_ids = [operation['id'] for operation in updates + deletes]
+        appointments = Appointment.objects.select_related('times').in_bulk(appointment_ids)
+        missing = set(appointment_ids) - set(appointments)
+        if missing:
+            raise NotFound(f"Appointment(s) {', '.join(str(pk) for pk in sorted(missing))} not found.")
+        if any(appointment.client_id != user.id for appointment in appointments.values()):
+            raise PermissionDenied('You can only change your own appointments.')
+
+        # slots given up by this batch can be booked by other operations in it
+        deleted_ids = [operation['id'] for operation in deletes]
+        released = list(deleted_ids)
+        booking = [slots[operation['times']['id']] for operation in creates]
+        for operation in updates:
+            appointment = appointments[operation['id']]
+            target = operation.get('times', {}).get('id', appointment.times_id)
+            if target != appointment.times_id:
+                released.append(appointment.id)
+                booking.append(slots[target])
+        # only the slots booked or moved to, an update that stays on its slot needn't be offered still
+        schedule = current_schedule()
+        closed = {slot.id: slot for slot in booking if not slot_offered(slot, schedule)}
+        if closed:
+            raise ValidationError({'operations': [f"No slot is offered on {describe(slot)}." for _, slot in sorted(closed.items())]})
+        check_capacity(booking, excluding=released)
+        # the slots given up, locked before the writes below lock the SyncCounter
+        waitlists = lock_waitlists([appointments[pk].times_id for pk in released])
+
+        lines = []
+        for pk in deleted_ids:
+            lines.append(f"deleted your appointment on {describe(appointments[pk].times)}")
+        with batched_tombstones():
+            Appointment.objects.filter(id__in=deleted_ids).delete()
+
+        updated = []
+        moved_from, moved_to = [], []
+        for operation in updates:
+            appointment = appointments[operation['id']]
+            old_times = appointment.times
+            if operation.get('times', {}).get('id') is not None:
+                appointment.times = slots[operation['times']['id']]
+            if appointment.times_id != old_times.id:
+                moved_from.append(old_times.id)
+                moved_to.append(appointment.times_id)
+            appointment.filled = operation.get('filled', appointment.filled)
+            appointment.client = user
+            appointment.modified = timezone.now()
+            updated.append(appointment)
+            lines.append(f"changed your appointment from {describe(old_times)} to {describe(appointment.times)}")
+
+        new_appointments = []
+        for operation in creates:
+            time = slots[operation['times']['id']]
+            new_appointments.append(Appointment(times=time, client=user, filled=operation.get('filled', True)))
+            lines.append(f"booked an appointment on {describe(time)}")
+
+        if updated or new_appointments:
+            seq = next_sync_seq()
+            for appointment in updated + new_appointments:
+                appointment.updated_seq = seq
+        Appointment.objects.bulk_update(updated, ['times', 'filled', 'client', 'modified', 'updated_seq'])
+        Appointment.objects.bulk_create(new_appointments)
+        cache.invalidate() # bulk_update and bulk_create send no signals
+        announce(SLOT_FREED, moved_from) # the deletes were announced by their post_delete signals
+        announce(SLOT_TAKEN, moved_to + [appointment.times_id for appointment in new_appointments])
+        promote_waiters(waitlists)
+
+        if lines:
+            queue_mail('Appointment Changes',
+                       f"Hello {user.username} you have made these changes:\n" + "\n".join(lines),
+                       'from@example.com',
+                       [f'{user.email}'])
+
+    created = list(Appointment.objects.select_related('times', 'client').filter(id__in=[a.id for a in new_appointments]).order_by('id'))
+    updated = list(Appointment.objects.select_related('times', 'client').filter(id__in=[a.id for a in updated]).order_by('id'))
+    return created, updated, deleted_ids
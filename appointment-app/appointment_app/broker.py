@@ -0,0 +1,112 @@
+import asyncio
+import itertools
+import threading
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'appointment_app.broker.InProcessBroker'
+QUEUE_SIZE = 100
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """
+    One subscriber's queue of (id, event, data) messages, read from the event loop that created it.
+
+    If the subscriber falls QUEUE_SIZE messages behind, the backlog is dropped and next()
+    returns a single resync message instead, telling the client to refetch.
+    """
+
+    def __init__(self, broker, loop):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    async def next(self, timeout=None):
+        """
+        The next message, or None if nothing arrived within timeout seconds.
+        """
+        if self.overflowed:
+            self.overflowed = False
+            return None, 'resync', {}
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return message
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fans events out to the subscribers in this process.
+
+    publish() can be called from any thread, each subscriber's queue is fed on its own event loop.
+    With several server processes every process needs a broker that reaches the others (e.g. one
+    subscribed to Redis pub/sub), anything with the same publish()/subscribe() methods can be set
+    as APPOINTMENT_BROKER.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def subscribe(self):
+        """
+        Start receiving events, call from a coroutine and close() the subscription when done.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        with self.lock:
+            message = (next(self.ids), event, data)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError: # its event loop is closed
+                self.unsubscribe(subscription)
+
+
+def get_broker():
+    """
+    The process wide broker, of the class named by APPOINTMENT_BROKER.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'APPOINTMENT_BROKER', DEFAULT_BROKER))()
+        return _broker
+
+
+def reset_broker():
+    """
+    Drop the broker so the next get_broker() builds a new one, for tests and settings changes.
+    """
+    global _broker
+    with _broker_lock:
+        _broker = None
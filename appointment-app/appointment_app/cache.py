@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from appointment_app import routers
+
+GENERATION_KEY = 'appointments:generation'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'APPOINTMENT_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'APPOINTMENT_CACHE_TIMEOUT', 300)
+
+
+def fresh_generation():
+    # a lost generation key restarts from the clock, above any version entries may still be
+    # stored under, so nothing cached before it was lost can be served again
+    return time.time_ns()
+
+
+def generation():
+    """
+    The current cache generation, every cached response is stored under it as the key version.
+    """
+    cache = get_cache()
+    current = cache.get(GENERATION_KEY)
+    if current is None:
+        seed = fresh_generation()
+        cache.add(GENERATION_KEY, seed, timeout=None)
+        current = cache.get(GENERATION_KEY, seed)
+    return current
+
+
+async def ageneration():
+    cache = get_cache()
+    current = await cache.aget(GENERATION_KEY)
+    if current is None:
+        seed = fresh_generation()
+        await cache.aadd(GENERATION_KEY, seed, timeout=None)
+        current = await cache.aget(GENERATION_KEY, seed)
+    return current
+
+
+def bump_generation():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError: # evicted or never set
+        cache.add(GENERATION_KEY, fresh_generation(), timeout=None)
+
+
+def invalidate():
+    """
+    Orphan everything cached so far by moving to a new generation, instead of deleting keys.
+
+    The bump happens now and again once the transaction commits: a reader that slipped in
+    between the first bump and the commit could otherwise cache pre-commit data under the new
+    generation.
+    """
+    bump_generation()
+    transaction.on_commit(bump_generation)
+
+
+def record(kind, outcome, count=1):
+    with _stats_lock:
+        _stats[f'{kind}_{outcome}'] += count
+        _stats[outcome] += count
+
+
+def cache_stats():
+    """
+    Hit and miss counters for this process, overall and per kind of response.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.setdefault('hits', 0)
+    stats.setdefault('misses', 0)
+    stats['generation'] = generation()
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def make_key(kind, identity):
+    return f'appointments:{kind}:' + hashlib.md5(str(identity).encode()).hexdigest()
+
+
+def cached(kind, identity, compute):
+    """
+    Read through the cache: return the value stored for (kind, identity) in the current
+    generation, or compute, store and return it. None is never cached.
+    """
+    cache = get_cache()
+    version = generation() # read before the database so a concurrent bump can't be missed
+    key = make_key(kind, identity)
+    # a client pinned to the primary skips what may have been cached from a lagging replica
+    value = None if routers.pinned_to_primary() else cache.get(key, version=version)
+    if value is not None:
+        record(kind, 'hits')
+        return value
+    record(kind, 'misses')
+    value = compute()
+    if value is not None:
+        cache.set(key, value, routers.cache_timeout(get_timeout()), version=version)
+    return value
+
+
+async def acached(kind, identity, compute):
+    """
+    cached() for async views: compute is a coroutine function and the cache is used through its
+    async API. Keys are the same as cached()'s, so a sync and an async view for one URL share entries.
+    """
+    cache = get_cache()
+    version = await ageneration()
+    key = make_key(kind, identity)
+    value = None if routers.pinned_to_primary() else await cache.aget(key, version=version)
+    if value is not None:
+        record(kind, 'hits')
+        return value
+    record(kind, 'misses')
+    value = await compute()
+    if value is not None:
+        await cache.aset(key, value, routers.cache_timeout(get_timeout()), version=version)
+    return value
+
+
+def cached_per_date(kind, dates, compute_range):
+    """
+    Like cached() but for one entry per date. compute_range(first, last) is called once for the
+    span of dates that were missing and must return {date: value} (dates with no value can be left out).
+    """
+    cache = get_cache()
+    version = generation()
+    keys = {make_key(kind, day.isoformat()): day for day in dates}
+    found = {} if routers.pinned_to_primary() else cache.get_many(list(keys), version=version)
+    values = {keys[key]: value for key, value in found.items()}
+    missing = [day for day in dates if day not in values]
+    record(kind, 'hits', len(values))
+    record(kind, 'misses', len(missing))
+    if missing:
+        computed = compute_range(min(missing), max(missing))
+        fresh = {day: computed.get(day, []) for day in missing}
+        cache.set_many({make_key(kind, day.isoformat()): value for day, value in fresh.items()},
+                       routers.cache_timeout(get_timeout()), version=version)
+        values.update(fresh)
+    return [values[day] for day in dates]
@@ -0,0 +1,164 @@
+import bisect
+import datetime
+from django.db.models import Q
+from appointment_app.exceptions import SlotTaken
+from appointment_app.locking import lock_resources, lock_shared_calendar
+from appointment_app.models import Appointment, compute_time_begin
+
+SHARED_CAPACITY = 1 # the slots without a resource
+
+
+class IntervalIndex:
+    """
+    The booked [start, end) intervals of one calendar, kept sorted by start along with the longest
+    one's length.
+
+    Only intervals starting after `start - longest` and before `end` can overlap [start, end), so
+    an overlap query bisects to that window instead of comparing against every booking: about
+    O(log n + k) for k bookings in the window, where a pairwise check is O(n) per query.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals)
+        self._starts = [start for start, _ in self._intervals]
+        self._longest = max((end - start for start, end in self._intervals), default=None)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def add(self, start, end):
+        position = bisect.bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._intervals.insert(position, (start, end))
+        if self._longest is None or end - start > self._longest:
+            self._longest = end - start
+
+    def overlapping(self, start, end):
+        """
+        The intervals that share a moment with [start, end), touching ends don't count.
+        """
+        if self._longest is None:
+            return []
+        first = bisect.bisect_right(self._starts, start - self._longest)
+        last = bisect.bisect_left(self._starts, end)
+        return [interval for interval in self._intervals[first:last] if interval[1] > start]
+
+    def depth(self, start, end):
+        """
+        The most intervals in progress at one moment of [start, end).
+        """
+        events = []
+        for begin, finish in self.overlapping(start, end):
+            events.append((max(begin, start), 1))
+            events.append((finish, -1))
+        current = deepest = 0
+        for _, change in sorted(events): # an end sorts before a start at the same moment
+            current += change
+            deepest = max(deepest, current)
+        return deepest
+
+    def fits(self, start, end, capacity):
+        """
+        Whether one more interval [start, end) keeps every moment below `capacity` + 1 deep.
+        """
+        overlapping = self.overlapping(start, end)
+        if len(overlapping) < capacity: # can't be deeper than that, skip the sweep
+            return True
+        return self.depth(start, end) < capacity
+
+
+def slot_interval(slot):
+    return compute_time_begin(slot.date_start, slot.time_start), slot.time_end
+
+
+def slot_capacity(slot):
+    return slot.resource.capacity if slot.resource_id is not None else SHARED_CAPACITY
+
+
+def booked_indexes(dates, resource_ids, excluding=()):
+    """
+    {resource_id: IntervalIndex} of the appointments whose slots start on one of `dates` in the
+    calendars of resource_ids (None is the shared one), leaving out the appointment ids in
+    `excluding`. One query for the lot.
+    """
+    in_resources = Q(times__resource_id__in=[resource_id for resource_id in resource_ids if resource_id is not None])
+    if None in resource_ids:
+        in_resources |= Q(times__resource__isnull=True)
+    booked = Appointment.objects.filter(in_resources, times__date_start__in=sorted(dates))
+    if excluding:
+        booked = booked.exclude(id__in=list(excluding))
+    intervals = {}
+    for resource_id, date_start, time_start, time_end in booked.values_list('times__resource_id', 'times__date_start',
+                                                                            'times__time_start', 'times__time_end'):
+        intervals.setdefault(resource_id, []).append((compute_time_begin(date_start, time_start), time_end))
+    return {resource_id: IntervalIndex(found) for resource_id, found in intervals.items()}
+
+
+def slot_indexes(slots):
+    """
+    {resource_id: IntervalIndex} of Times annotated with the number of appointments `booked` on them.
+    """
+    intervals = {}
+    for slot in slots:
+        if slot.booked:
+            intervals.setdefault(slot.resource_id, []).extend([slot_interval(slot)] * slot.booked)
+    return {resource_id: IntervalIndex(found) for resource_id, found in intervals.items()}
+
+
+def around(dates):
+    # a slot can run past midnight, so the day either side can hold bookings that overlap it
+    return min(dates) - datetime.timedelta(days=1), max(dates) + datetime.timedelta(days=1)
+
+
+def nearby_dates(dates):
+    return {day + datetime.timedelta(days=offset) for day in dates for offset in (-1, 0, 1)}
+
+
+def lock_calendars(slots):
+    """
+    Lock the calendars of `slots`, their resources and the shared calendar on the dates its slots
+    can overlap, and return the capacities as {resource_id: capacity}.
+    """
+    capacities = lock_resources({slot.resource_id for slot in slots} - {None})
+    lock_shared_calendar(nearby_dates({slot.date_start for slot in slots if slot.resource_id is None}))
+    return capacities
+
+
+def calendar_indexes(slots, excluding=()):
+    """
+    booked_indexes() of the calendars of `slots` on the dates around them. Add to an index what
+    gets booked after, so it keeps answering for the rest of the transaction.
+    """
+    return booked_indexes(nearby_dates({slot.date_start for slot in slots}), {slot.resource_id for slot in slots}, excluding)
+
+
+def check_capacity(slots, excluding=()):
+    """
+    Raise SlotTaken unless one more appointment on each of `slots` (locked Times, in order) fits
+    next to those already booked, without the appointments in `excluding` (being moved or deleted).
+
+    Call it in the booking's transaction: the resources, and the shared calendar on the dates a
+    booking can overlap, are locked first, so two bookings of overlapping slots of one calendar
+    queue up even though they lock different Times rows.
+    """
+    if not slots:
+        return
+    capacities = lock_calendars(slots)
+    indexes = calendar_indexes(slots, excluding)
+    for slot in slots:
+        index = indexes.setdefault(slot.resource_id, IntervalIndex())
+        start, end = slot_interval(slot)
+        if not index.fits(start, end, capacities.get(slot.resource_id, SHARED_CAPACITY)):
+            raise SlotTaken()
+        index.add(start, end)
+
+
+def has_room(slot, excluding=()):
+    """
+    check_capacity() for one slot, as True or False.
+    """
+    try:
+        check_capacity([slot], excluding)
+    except SlotTaken:
+        return False
+    return True
@@ -0,0 +1,62 @@
+import hashlib
+from rest_framework.permissions import SAFE_METHODS
+from appointment_app.filters import wants_archive
+from appointment_app.models import Appointment, ArchivedAppointment, SyncCounter
+
+
+def _validators(request, key, compute):
+    """
+    Work the validators out once per request, condition() asks for the ETag and Last-Modified separately.
+    """
+    cache = request.__dict__.setdefault('_conditional_validators', {})
+    if key not in cache:
+        cache[key] = compute() if request.method in SAFE_METHODS else (None, None)
+    return cache[key]
+
+
+def _etag(request, *parts):
+    # the same rows render differently per page, filter and renderer, so those go into the tag too
+    raw = ':'.join(str(part) for part in parts + (request.get_full_path(), request.META.get('HTTP_ACCEPT', '')))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_validators(request):
+    """
+    (etag, None) for the filtered appointment list, from one primary key read of the sync counter.
+
+    Every write that can change a list takes a new seq (saves, update() paths, deletes through
+    their tombstones and archive_past), so the head stands for all of them; the path in the tag
+    tells the filters and pages apart. There is no Last-Modified: a delete leaves no row to date
+    the list by, so If-Modified-Since would answer 304 for a list that lost rows.
+    """
+    def compute():
+        head = SyncCounter.objects.filter(pk=1).values_list('value', flat=True).first()
+        return _etag(request, head or 0), None
+    return _validators(request, 'list', compute)
+
+
+def detail_validators(request, pk):
+    """
+    (etag, last_modified) for one appointment, from its and its slot's modified timestamps.
+    """
+    def compute():
+        if wants_archive(request.query_params):
+            archived = ArchivedAppointment.objects.filter(pk=pk).values_list('archived_at', flat=True).first()
+            return (_etag(request, archived), archived) if archived else (None, None)
+        row = Appointment.objects.filter(pk=pk).values_list('modified', 'times__modified').first()
+        if row is None:
+            return None, None
+        return _etag(request, *row), max(row)
+    return _validators(request, ('detail', pk), compute)
+
+
+def list_etag(request, format=None):
+    return list_validators(request)[0]
+
+
+def detail_etag(request, pk, format=None):
+    return detail_validators(request, pk)[0]
+
+
+def detail_last_modified(request, pk, format=None):
+    return detail_validators(request, pk)[1]
@@ -0,0 +1,41 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.views import exception_handler as drf_exception_handler
+
+
+class SlotTaken(APIException):
+    """
+    Raised when someone tries to book or move to a slot that already has an appointment.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This slot has already been booked.'
+    default_code = 'slot_taken'
+
+
+class ResyncRequired(APIException):
+    """
+    Raised when a sync token is older than the tombstones that are still kept.
+    """
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Changes since this token are no longer available, sync again without since.'
+    default_code = 'resync_required'
+
+
+def exception_handler(exc, context):
+    """
+    DRF's handler, except that a request that sent a Bearer token gets a 401 with a Bearer
+    challenge when authentication fails, not the 403 DRF falls back to because session
+    authentication comes first. A token client can then tell "refresh your token" from
+    "forbidden"; requests without credentials still get the 403.
+    """
+    from appointment_app.authentication import SignedTokenAuthentication
+
+    response = drf_exception_handler(exc, context)
+    if response is None or not isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        return response
+    authenticator = SignedTokenAuthentication()
+    request = context['request']
+    if request.headers.get('Authorization', '').split(' ')[0].lower() == authenticator.keyword.lower():
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = f'{authenticator.authenticate_header(request)}, error="invalid_token"'
+    return response
@@ -0,0 +1,46 @@
+import csv
+import json
+from appointment_app.archive import ARCHIVE_VALUES, archived_row
+from appointment_app.models import ArchivedAppointment
+from appointment_app.serializers import APPOINTMENT_VALUES, lean_appointment
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_COLUMNS = ('id', 'times_id', 'date_start', 'time_start', 'time_end', 'filled', 'client')
+
+
+class Echo:
+    """
+    File-like object for csv.writer that hands back each line instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the appointments (or archived appointments) in queryset as API-shaped dicts, reading
+    chunk_size rows at a time (a server-side cursor where the database has one) so memory stays
+    flat however big the table is.
+    """
+    if queryset.model is ArchivedAppointment:
+        for row in queryset.order_by('id').values(*ARCHIVE_VALUES).iterator(chunk_size=chunk_size):
+            yield lean_appointment(archived_row(row))
+        return
+    rows = queryset.order_by('id').values(*APPOINTMENT_VALUES).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield lean_appointment(row)
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for appointment in export_rows(queryset, chunk_size):
+        times = appointment['times']
+        yield writer.writerow((appointment['id'], times['id'], times['date_start'], times['time_start'],
+                               times['time_end'], appointment['filled'], appointment['client']))
+
+
+def stream_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for appointment in export_rows(queryset, chunk_size):
+        yield json.dumps(appointment, ensure_ascii=False, separators=(',', ':')) + '\n'
@@ -0,0 +1,45 @@
+import datetime
+from rest_framework.exceptions import ValidationError
+from appointment_app.models import ArchivedAppointment
+
+
+def parse_date_param(params, name):
+    """
+    Return the ``YYYY-MM-DD`` query parameter ``name`` as a date, or None if it is missing.
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: f"'{value}' is not a valid date, use YYYY-MM-DD."})
+
+
+def wants_archive(params):
+    """
+    Whether ?archived=true asks for the archived appointments rather than the current ones.
+    """
+    return params.get('archived', '').lower() in ('1', 'true', 'yes')
+
+
+def filter_appointments(queryset, params):
+    """
+    Apply the list filters (?date_from=, ?date_to=, ?owner=) to an appointment queryset, or an
+    ArchivedAppointment one.
+
+    date_from and date_to are inclusive and match against the slot date, owner is a username.
+    """
+    date_field = 'date_start' if queryset.model is ArchivedAppointment else 'times__date_start'
+    date_from = parse_date_param(params, 'date_from')
+    date_to = parse_date_param(params, 'date_to')
+    if date_from and date_to and date_from > date_to:
+        raise ValidationError({'date_to': 'date_to must not be before date_from.'})
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{date_field}__lte': date_to})
+    owner = params.get('owner')
+    if owner:
+        queryset = queryset.filter(client__username=owner)
+    return queryset
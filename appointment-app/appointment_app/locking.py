@@ -0,0 +1,72 @@
+import zlib
+from django.db import connection
+from django.db.models import F
+from appointment_app.models import Resource, Times
+
+
+def lock_slots(times_ids):
+    """
+    Lock the given Times rows for the rest of the transaction and return them as {id: Times}.
+
+    select_for_update makes concurrent bookers of the same slot queue up on PostgreSQL and MySQL.
+    SQLite has no row locks, so there a no-op UPDATE takes the database write lock before anything
+    is read; otherwise two bookers would both read and then fail to upgrade their locks with
+    "database is locked". Whether the slot has room is checked once it is locked, see
+    appointment_app.capacity.
+    """
+    slots = Times.objects.filter(id__in=times_ids)
+    if connection.vendor == 'sqlite':
+        slots.update(id=F('id'))
+    return {slot.id: slot for slot in slots.select_for_update().order_by('id')} # in id order, so lockers can't deadlock
+
+
+def lock_slot_at(date_start, time_start, resource_id=None):
+    """
+    lock_slots for the Times starting at time_start on date_start in the calendar of resource_id
+    (None for the shared one), None when there is no such row yet.
+
+    On SQLite the write lock is taken even when no row matches, so a booker that goes on to insert
+    the slot doesn't have to upgrade its lock either.
+    """
+    slots = Times.objects.filter(date_start=date_start, time_start=time_start, resource_id=resource_id)
+    if connection.vendor == 'sqlite':
+        slots.update(id=F('id'))
+    return slots.select_for_update().first()
+
+
+def lock_resources(resource_ids):
+    """
+    Lock the given Resource rows and return their capacities as {id: capacity}.
+
+    Bookings of overlapping slots of one resource lock different Times rows, this makes them queue
+    up too. The shared calendar has no Resource row, see lock_shared_calendar().
+    """
+    if not resource_ids:
+        return {}
+    resources = Resource.objects.filter(id__in=resource_ids)
+    if connection.vendor == 'sqlite':
+        resources.update(id=F('id'))
+    return dict(resources.select_for_update().order_by('id').values_list('id', 'capacity'))
+
+
+# the first key of the shared calendar's advisory locks, the second is the date's ordinal
+SHARED_CALENDAR_LOCK = zlib.crc32(b'appointment_app.shared_calendar') & 0x7fffffff
+
+
+def lock_shared_calendar(dates):
+    """
+    lock_resources for the shared calendar (the slots without a resource) on the given dates.
+
+    It has no Resource row to lock, so on PostgreSQL a transaction level advisory lock per date
+    stands in for one, taken in date order so two bookers can't deadlock. On SQLite a no-op UPDATE
+    takes the database write lock, as in lock_slots().
+    """
+    if not dates:
+        return
+    dates = sorted(dates)
+    if connection.vendor == 'sqlite':
+        Times.objects.filter(date_start__in=dates, resource__isnull=True).update(id=F('id'))
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, day) FROM unnest(%s) AS day',
+                       [SHARED_CALENDAR_LOCK, [day.toordinal() for day in dates]])
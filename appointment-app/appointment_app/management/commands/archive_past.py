@@ -0,0 +1,20 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from appointment_app import archive
+
+
+class Command(BaseCommand):
+    help = 'Move slots that have ended, and their appointments, out of the hot tables into the archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'APPOINTMENT_ARCHIVE_DAYS', 7),
+                            help='Archive the slots that ended more than this many days ago.')
+        parser.add_argument('--chunk-size', type=int, default=archive.DEFAULT_CHUNK_SIZE,
+                            help='Slots moved per transaction.')
+
+    def handle(self, *args, **options):
+        appointments, slots = archive.archive_past(timezone.now() - datetime.timedelta(days=options['days']),
+                                                   chunk_size=options['chunk_size'])
+        self.stdout.write(f'Archived {appointments} appointment(s) and {slots} slot(s).')
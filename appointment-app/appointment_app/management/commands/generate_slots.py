@@ -0,0 +1,34 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from appointment_app.models import CHOICES_TIME_START
+from appointment_app import slots
+
+
+class Command(BaseCommand):
+    help = 'Create the bookable Times for a date range in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('date_from', help='First day, YYYY-MM-DD.')
+        parser.add_argument('date_to', help='Last day (inclusive), YYYY-MM-DD.')
+        parser.add_argument('--weekdays', default='mon,tue,wed,thu,fri', help='Comma separated days, e.g. mon,wed,fri or 0,2,4.')
+        parser.add_argument('--times', help='Comma separated start times, e.g. 09:00,15:00. Defaults to every offered start time.')
+        parser.add_argument('--batch-size', type=int, default=slots.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.date.fromisoformat(options['date_from'])
+            date_to = datetime.date.fromisoformat(options['date_to'])
+            weekdays = slots.parse_weekdays(options['weekdays'])
+            start_times = None
+            if options['times']:
+                start_times = [datetime.time.fromisoformat(value.strip()) for value in options['times'].split(',')]
+        except ValueError as exc:
+            raise CommandError(exc)
+        if date_from > date_to:
+            raise CommandError('date_to must not be before date_from.')
+        offered = [time_start for time_start, _ in CHOICES_TIME_START]
+        if start_times and any(time_start not in offered for time_start in start_times):
+            raise CommandError(f"Start times must be among {', '.join(t.strftime('%H:%M') for t in sorted(offered))}.")
+
+        created = slots.generate_slots(date_from, date_to, weekdays, start_times, batch_size=options['batch_size'])
+        self.stdout.write(f'Created {created} slot(s) between {date_from} and {date_to}.')
@@ -0,0 +1,17 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from appointment_app.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete the delete markers /appointments/changes/ no longer needs to hand out.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'APPOINTMENT_TOMBSTONE_DAYS', 30),
+                            help='Keep the tombstones of the last this many days.')
+
+    def handle(self, *args, **options):
+        pruned = prune_tombstones(timezone.now() - datetime.timedelta(days=options['days']))
+        self.stdout.write(f'Pruned {pruned} tombstone(s).')
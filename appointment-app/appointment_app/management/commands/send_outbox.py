@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from appointment_app import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send the emails queued in the outbox, in batches over one reused connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=outbox.DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--backoff', type=int, default=outbox.DEFAULT_BACKOFF_SECONDS,
+                            help='Seconds to wait before the first retry, doubled on every further failure.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = outbox.send_pending(batch_size=options['batch_size'],
+                                               max_attempts=options['max_attempts'],
+                                               backoff=options['backoff'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f'Sent {total_sent} message(s), {total_failed} failed attempt(s).')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from appointment_app import reminders
+
+
+class Command(BaseCommand):
+    help = 'Email a reminder to every client whose appointment starts soon, once per appointment.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=reminders.DEFAULT_HOURS,
+                            help='Remind of appointments starting within this many hours.')
+        parser.add_argument('--chunk-size', type=int, default=reminders.DEFAULT_CHUNK_SIZE,
+                            help='Emails per send_messages() call and per transaction.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        sent = reminders.send_reminders(hours=options['hours'], chunk_size=options['chunk_size'])
+        self.stdout.write(f'Sent {sent} reminder(s).')
@@ -0,0 +1,142 @@
+import contextlib
+import json
+import logging
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from appointment_app import routers, timing
+
+log = logging.getLogger('appointment_app.timing')
+
+PHASES = ('db', 'serialize', 'render', 'mail')
+
+
+def sample_rate():
+    return getattr(settings, 'APPOINTMENT_TIMING_SAMPLE_RATE', 0.0)
+
+
+def sampled():
+    rate = sample_rate()
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def wrap_queries(recording):
+    """
+    Time the queries on every connection of the calling thread until the returned stack is closed.
+    """
+    stack = contextlib.ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recording.query_wrapper))
+    return stack
+
+
+def server_timing(recording, total):
+    """
+    Server-Timing header value, durations in milliseconds.
+    """
+    metrics = []
+    for phase in PHASES:
+        if phase in recording.durations:
+            metric = f'{phase};dur={recording.durations[phase] * 1000:.2f}'
+            if phase == 'db':
+                metric += f';desc="{recording.counts[phase]} queries"'
+            metrics.append(metric)
+    metrics.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(metrics)
+
+
+class RequestTimingMiddleware:
+    """
+    Times SQL, serialization, rendering and outbox mail for a sample of requests.
+
+    A sampled response gets a Server-Timing header and one JSON line is logged to
+    appointment_app.timing. APPOINTMENT_TIMING_SAMPLE_RATE is the fraction of requests sampled,
+    unsampled requests cost a random() call. Put it near the top of MIDDLEWARE so total covers
+    the other middleware too. Works under WSGI and ASGI without forcing async views into a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+        with timing.recording() as recording, wrap_queries(recording):
+            response = self.get_response(request)
+        return self.finish(request, response, recording)
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+        with timing.recording() as recording:
+            # connections are per thread, the async ORM queries on the request's sync thread
+            wrappers = await sync_to_async(wrap_queries)(recording)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+        return self.finish(request, response, recording)
+
+    def finish(self, request, response, recording):
+        total = recording.total()
+        response['Server-Timing'] = server_timing(recording, total)
+        log.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': recording.counts.get('db', 0),
+            **{f'{phase}_ms': round(recording.durations.get(phase, 0.0) * 1000, 2) for phase in PHASES},
+        }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter send the reads of safe requests to a replica, and pins a client that wrote
+    to the primary for APPOINTMENT_REPLICA_PIN_SECONDS (a cookie, and a cache key for its user).
+    Put it after AuthenticationMiddleware. Does nothing without APPOINTMENT_READ_REPLICAS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start_reads(request)
+        if token is None:
+            return self.get_response(request)
+        reads = routers.current_reads()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_reads(token)
+        return self.finish(reads, response)
+
+    async def __acall__(self, request):
+        token = routers.start_reads(request)
+        if token is None:
+            return await self.get_response(request)
+        reads = routers.current_reads()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_reads(token)
+        return self.finish(reads, response)
+
+    def finish(self, reads, response):
+        if reads.wrote:
+            reads.pin(response)
+        return response
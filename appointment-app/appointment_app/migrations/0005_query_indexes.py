@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment_app', '0004_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'times'], name='appointment_client_times'),
+        ),
+        migrations.AddIndex(
+            model_name='times',
+            index=models.Index(fields=['date_start', 'time_start'], name='times_date_start'),
+        ),
+    ]
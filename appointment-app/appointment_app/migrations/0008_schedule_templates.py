@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:40
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment_app', '0007_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('weekdays', models.CharField(help_text='Comma separated, mon..sun or 0..6 (Monday is 0).', max_length=50)),
+                ('start_times', models.CharField(help_text='Comma separated, e.g. 09:00,11:30.', max_length=255)),
+                ('duration', models.DurationField(default=datetime.timedelta(seconds=1800))),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='times',
+            name='time_start',
+            field=models.TimeField(),
+        ),
+        migrations.CreateModel(
+            name='ScheduleException',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('time_start', models.TimeField(blank=True, null=True)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='appointment_app.scheduletemplate')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='times',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slots', to='appointment_app.scheduletemplate'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment_app', '0008_schedule_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Resource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('practitioner', 'Practitioner'), ('room', 'Room')], default='practitioner', max_length=20)),
+                ('capacity', models.PositiveIntegerField(default=1)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='times',
+            name='unique_datetime',
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='times',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='times', to='appointment_app.times'),
+        ),
+        migrations.AddField(
+            model_name='scheduletemplate',
+            name='resource',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='templates', to='appointment_app.resource'),
+        ),
+        migrations.AddField(
+            model_name='times',
+            name='resource',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='appointment_app.resource'),
+        ),
+        migrations.AddConstraint(
+            model_name='times',
+            constraint=models.UniqueConstraint(condition=models.Q(('resource__isnull', True)), fields=('time_start', 'date_start'), name='unique_datetime'),
+        ),
+        migrations.AddConstraint(
+            model_name='times',
+            constraint=models.UniqueConstraint(fields=('resource', 'date_start', 'time_start'), name='unique_resource_datetime'),
+        ),
+    ]
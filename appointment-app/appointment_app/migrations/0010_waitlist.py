@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointment_app', '0009_resources'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+                ('times', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='appointment_app.times')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['times', '-priority', 'created'], name='waitlist_order')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(fields=('times', 'client'), name='unique_waitlist_entry'),
+        ),
+    ]
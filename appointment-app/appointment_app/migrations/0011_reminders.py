@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment_app', '0010_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='times',
+            index=models.Index(fields=['time_end'], name='times_time_end'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='appointment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='appointment_app.appointment'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='times',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointment_app.times'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'times'), name='unique_reminder'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointment_app', '0011_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('times_id', models.IntegerField()),
+                ('filled', models.BooleanField(default=True)),
+                ('date_start', models.DateField()),
+                ('time_start', models.TimeField()),
+                ('time_end', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to=settings.AUTH_USER_MODEL)),
+                ('resource', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='appointment_app.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date_start', 'time_start'], name='archive_date_start')],
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 import datetime
 import pytz
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib import auth # built in django stuff for accounts
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 User._meta.get_field('email').blank = False
@@ -13,8 +15,153 @@ CHOICES_TIME_START = (
     (datetime.time(11), datetime.time(11)),
 )
 
+SLOT_LENGTH = datetime.timedelta(minutes=30)
 
-class Times(models.Model):
+
+def compute_time_begin(date_start, time_start):
+    """
+    When a slot starting at time_start on date_start begins, as an aware datetime.
+    """
+    date_time_combined = datetime.datetime.combine(date_start, time_start)
+    return timezone.make_aware(date_time_combined)
+
+
+def compute_time_end(date_start, time_start, length=SLOT_LENGTH):
+    """
+    When a slot starting at time_start on date_start finishes, as an aware datetime.
+    """
+    return compute_time_begin(date_start, time_start) + length
+
+
+class SyncCounter(models.Model):
+    """
+    The single row that hands out updated_seq values for /appointments/changes/.
+
+    pruned_through is the newest seq whose tombstones have been pruned, a client that last
+    synced before it has to start again from scratch.
+    """
+    value = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+
+def next_sync_seq(count=1):
+    """
+    Reserve `count` sequence numbers and return the highest.
+
+    Call it inside the transaction that writes them: the counter row stays locked until that
+    transaction commits, so writers commit in seq order and a reader never sees seq n + 1 before n.
+    """
+    if not SyncCounter.objects.filter(pk=1).update(value=F('value') + count):
+        SyncCounter.objects.get_or_create(pk=1)
+        SyncCounter.objects.filter(pk=1).update(value=F('value') + count)
+    return SyncCounter.objects.values_list('value', flat=True).get(pk=1)
+
+
+class SyncedModel(models.Model):
+    """
+    Stamps every save with a new updated_seq. bulk_create, bulk_update and update() skip save(),
+    set updated_seq from next_sync_seq() yourself there.
+    """
+    updated_seq = models.BigIntegerField(default=0, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            self.updated_seq = next_sync_seq()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_seq'}
+            super().save(*args, **kwargs)
+
+
+class Resource(models.Model):
+    """
+    A practitioner or room with a calendar of its own. At most `capacity` of its appointments may
+    overlap at any moment, 1 for a practitioner, more for e.g. a group room.
+
+    Slots without a resource make up the original single calendar, with a capacity of 1.
+    """
+    PRACTITIONER = 'practitioner'
+    ROOM = 'room'
+    KIND_CHOICES = (
+        (PRACTITIONER, 'Practitioner'),
+        (ROOM, 'Room'),
+    )
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=PRACTITIONER)
+    capacity = models.PositiveIntegerField(default=1)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ScheduleTemplate(models.Model):
+    """
+    A recurring opening: a slot `duration` long at each of start_times on each of weekdays, from
+    valid_from until valid_until (open ended when empty).
+
+    Template slots are worked out in memory for availability (appointment_app.schedules) and only
+    saved as Times when someone books one, so the slot table grows with the bookings.
+    """
+    name = models.CharField(max_length=100)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, null=True, blank=True, related_name='templates') # empty for the shared calendar
+    weekdays = models.CharField(max_length=50, help_text='Comma separated, mon..sun or 0..6 (Monday is 0).')
+    start_times = models.CharField(max_length=255, help_text='Comma separated, e.g. 09:00,11:30.')
+    duration = models.DurationField(default=SLOT_LENGTH)
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    def weekday_list(self):
+        from appointment_app.slots import parse_weekdays
+
+        return sorted(set(parse_weekdays(self.weekdays)))
+
+    def start_time_list(self):
+        return sorted({datetime.time.fromisoformat(part.strip()) for part in self.start_times.split(',') if part.strip()})
+
+    def clean(self):
+        errors = {}
+        try:
+            self.weekday_list()
+        except ValueError as exc:
+            errors['weekdays'] = str(exc)
+        try:
+            if not self.start_time_list():
+                errors['start_times'] = 'At least one start time is required.'
+        except ValueError:
+            errors['start_times'] = 'Use HH:MM start times separated by commas.'
+        if self.duration is not None and self.duration <= datetime.timedelta(0):
+            errors['duration'] = 'The duration must be positive.'
+        if self.valid_until is not None and self.valid_from is not None and self.valid_until < self.valid_from:
+            errors['valid_until'] = 'valid_until must not be before valid_from.'
+        if errors:
+            raise ValidationError(errors)
+
+
+class ScheduleException(models.Model):
+    """
+    A date a template doesn't offer, e.g. a holiday, or only one start time on it when time_start
+    is set. Without a template it closes every template, and the slots that predate templates.
+    """
+    template = models.ForeignKey(ScheduleTemplate, on_delete=models.CASCADE, null=True, blank=True, related_name='exceptions')
+    date = models.DateField(db_index=True)
+    time_start = models.TimeField(null=True, blank=True)
+    reason = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        closed = self.time_start.strftime('%H:%M') if self.time_start else 'all day'
+        return f"{self.template or 'Every template'} closed on {self.date} ({closed})"
+
+
+class Times(SyncedModel):
     
     '''
     class TimeChoices(datetime.time, models.Choices):
@@ -22,20 +169,31 @@ class Times(models.Model):
         TenAm = 10, '10AM'
         ElevenAm = 11, '11AM'
     '''
-    time_start = models.TimeField(choices=CHOICES_TIME_START)
+    time_start = models.TimeField()
     date_start = models.DateField()
     time_end = models.DateTimeField(editable=False)
+    modified = models.DateTimeField(auto_now=True)
+    template = models.ForeignKey(ScheduleTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='slots') # the template it was booked from
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, null=True, blank=True, related_name='slots')
     
     class Meta:
-        constraints = [models.UniqueConstraint(fields=['time_start', 'date_start'], name='unique_datetime')]
+        constraints = [
+            # one slot per start on the shared calendar, and per start on each resource's calendar
+            models.UniqueConstraint(fields=['time_start', 'date_start'], condition=models.Q(resource__isnull=True), name='unique_datetime'),
+            models.UniqueConstraint(fields=['resource', 'date_start', 'time_start'], name='unique_resource_datetime'),
+        ]
+        indexes = [
+            # date ranges (list filters, availability, export); unique_datetime leads with time_start so can't serve them
+            models.Index(fields=['date_start', 'time_start'], name='times_date_start'),
+            # the slots ending in a time window, for reminders
+            models.Index(fields=['time_end'], name='times_time_end'),
+        ]
     
     def __str__(self):
         return f"Appointment from {self.time_start.strftime('%H:%M')} till {self.time_end.strftime('%H:%M') } on {self.date_start.strftime('%m-%d-%Y')}"
     
     def save(self, *args, **kwargs):
-        date_time_combined = datetime.datetime.combine(self.date_start, self.time_start)
-        date_time_combined = timezone.make_aware(date_time_combined)
-        self.time_end = date_time_combined + datetime.timedelta(minutes=30)
+        self.time_end = compute_time_end(self.date_start, self.time_start, self.template.duration if self.template_id else SLOT_LENGTH)
         super().save(*args, **kwargs)
                 
     
@@ -44,13 +202,148 @@ class Times(models.Model):
 #	def __str__(self):
 #		return "@{}".format(self.username)
 
-class Appointment(models.Model):
-    times = models.OneToOneField(Times, on_delete=models.CASCADE, related_name='times')
+class Appointment(SyncedModel):
+    times = models.ForeignKey(Times, on_delete=models.CASCADE, related_name='times') # up to the resource's capacity per slot
     filled = models.BooleanField(default=True)
     client = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='clients')
+    modified = models.DateTimeField(auto_now=True) # bulk_update and update() skip auto_now and updated_seq, set them yourself there
+
+    class Meta:
+        indexes = [
+            # one client's appointments joined to their slots without touching the table
+            models.Index(fields=['client', 'times'], name='appointment_client_times'),
+        ]
 
     
     def __str__(self):
         return f"Booked on {self.times} by {self.client}"
 
 
+class WaitlistEntry(models.Model):
+    """
+    A client waiting for a place on a full slot. When an appointment on it is cancelled or moved
+    away, the first waiter (highest priority, then first come) is booked in the same transaction,
+    see appointment_app.waitlist.
+    """
+    times = models.ForeignKey(Times, on_delete=models.CASCADE, related_name='waitlist')
+    client = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='waitlist_entries')
+    priority = models.IntegerField(default=0) # higher goes first, set by staff
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['times', 'client'], name='unique_waitlist_entry')]
+        indexes = [
+            # the waiters of a slot in promotion order
+            models.Index(fields=['times', '-priority', 'created'], name='waitlist_order'),
+        ]
+
+    def __str__(self):
+        return f"{self.client} waiting for {self.times}"
+
+
+class Tombstone(models.Model):
+    """
+    Marks a deleted Appointment or Times for /appointments/changes/, so clients that keep a copy
+    can drop it. Written by the post_delete signals, in the deleting transaction.
+    """
+    APPOINTMENT = 'appointment'
+    TIMES = 'times'
+    MODEL_CHOICES = (
+        (APPOINTMENT, 'Appointment'),
+        (TIMES, 'Times'),
+    )
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.IntegerField()
+    updated_seq = models.BigIntegerField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.updated_seq}"
+
+
+class RevokedToken(models.Model):
+    """
+    A signed API token that was revoked before it expired, see appointment_app.authentication.
+    Rows past expires_at no longer matter and are deleted when the next token is revoked.
+    """
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} revoked until {self.expires_at}"
+
+
+class Reminder(models.Model):
+    """
+    A reminder email sent by send_reminders for an appointment on a slot. Moving the appointment to
+    another slot makes it due again.
+    """
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    times = models.ForeignKey(Times, on_delete=models.CASCADE, related_name='+')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['appointment', 'times'], name='unique_reminder')]
+
+    def __str__(self):
+        return f"Reminder for {self.appointment_id} on {self.times_id} sent {self.sent_at}"
+
+
+class ArchivedAppointment(models.Model):
+    """
+    An appointment on a slot that has ended, moved out of the Appointment and Times tables by the
+    archive_past command with the slot folded in. It keeps its id, so links to it still resolve
+    with ?archived=true.
+    """
+    id = models.IntegerField(primary_key=True) # the Appointment's
+    times_id = models.IntegerField() # the Times', that row is gone
+    client = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='archived_appointments')
+    filled = models.BooleanField(default=True)
+    date_start = models.DateField()
+    time_start = models.TimeField()
+    time_end = models.DateTimeField()
+    resource = models.ForeignKey(Resource, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date_start', 'time_start'], name='archive_date_start')]
+
+    def __str__(self):
+        return f"Archived {self.id} on {self.date_start} at {self.time_start} by {self.client_id}"
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to be sent by the send_outbox worker.
+
+    Rows are written in the same transaction as the booking they describe, so a message is only
+    sent for a change that was committed, and SMTP is kept out of the request path.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending' # claimed by a worker until next_attempt_at
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField() # comma separated list of addresses
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due')]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipients} ({self.status})"
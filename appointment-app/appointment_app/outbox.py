@@ -0,0 +1,113 @@
+import datetime
+import logging
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from appointment_app import timing
+from appointment_app.models import OutboxMessage
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 60
+DEFAULT_LEASE_SECONDS = 300 # how long a worker may take to send a claimed batch
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Drop in for send_mail that writes the email to the outbox instead of talking to SMTP.
+
+    Call it inside the transaction that makes the change the email is about.
+    """
+    with timing.timed('mail'):
+        return OutboxMessage.objects.create(subject=subject, body=message, from_email=from_email,
+                                            recipients=','.join(recipient_list))
+
+
+def retry_delay(attempts, backoff=DEFAULT_BACKOFF_SECONDS):
+    """
+    Exponential backoff: backoff, 2 * backoff, 4 * backoff ... seconds after each failed attempt.
+    """
+    return datetime.timedelta(seconds=backoff * 2 ** (attempts - 1))
+
+
+def _record_failure(message, exc, now, max_attempts, backoff):
+    log.warning('Sending outbox message %s failed (attempt %s): %s', message.id, message.attempts, exc)
+    message.last_error = str(exc)
+    if message.attempts >= max_attempts:
+        message.status = OutboxMessage.FAILED
+    else:
+        message.status = OutboxMessage.PENDING
+        message.next_attempt_at = now + retry_delay(message.attempts, backoff)
+
+
+def claim_due(batch_size=DEFAULT_BATCH_SIZE, lease=DEFAULT_LEASE_SECONDS):
+    """
+    Mark up to batch_size due messages as sending and return them, in one short transaction.
+
+    A claim is a lease: next_attempt_at is moved `lease` seconds ahead, and if the worker dies
+    before recording the outcome the messages are due again once it runs out. The UPDATE only
+    matches rows that are still claimable and stamps them with this claim's lease, so two workers
+    never get the same message.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        due = (OutboxMessage.objects
+               .filter(status__in=(OutboxMessage.PENDING, OutboxMessage.SENDING), next_attempt_at__lte=now))
+        ids = list(due.select_for_update(skip_locked=True).order_by('next_attempt_at', 'id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        until = now + datetime.timedelta(seconds=lease)
+        due.filter(id__in=ids).update(status=OutboxMessage.SENDING, next_attempt_at=until)
+    return list(OutboxMessage.objects.filter(id__in=ids, status=OutboxMessage.SENDING, next_attempt_at=until).order_by('id'))
+
+
+def send_pending(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff=DEFAULT_BACKOFF_SECONDS, connection=None, lease=DEFAULT_LEASE_SECONDS):
+    """
+    Send one batch of due outbox messages over a single email connection.
+
+    Returns a (sent, failed) tuple for the batch. A message that fails is retried with exponential
+    backoff until it has been tried max_attempts times, after which it is marked failed. The batch
+    is claimed and its outcome recorded in two short transactions, SMTP runs between them with no
+    transaction open, so a slow mail server never holds the database write lock. Delivery is at
+    least once: if the worker dies mid batch the whole batch is retried when its lease runs out.
+    """
+    sent = failed = 0
+    messages = claim_due(batch_size, lease)
+    if not messages:
+        return sent, failed
+
+    now = timezone.now()
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # the mail server is down, count it as a failed attempt for the whole batch
+        for message in messages:
+            message.attempts += 1
+            _record_failure(message, exc, now, max_attempts, backoff)
+        failed = len(messages)
+    else:
+        try:
+            for message in messages:
+                email = EmailMessage(message.subject, message.body, message.from_email,
+                                     message.recipients.split(','), connection=connection)
+                message.attempts += 1
+                try:
+                    email.send()
+                except Exception as exc:
+                    _record_failure(message, exc, now, max_attempts, backoff)
+                    failed += 1
+                else:
+                    message.status = OutboxMessage.SENT
+                    message.sent_at = timezone.now()
+                    message.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_update(messages, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
@@ -0,0 +1,60 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AppointmentCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the appointment list.
+
+    Pages are fetched with ``WHERE id > <cursor> ORDER BY id LIMIT n`` so the
+    cost of a page does not depend on how deep into the table it is.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset() for async views, the page is fetched with the async ORM.
+
+        The same steps as CursorPagination.paginate_queryset with its one blocking list() awaited,
+        the ordering is always 'id' so there are no view ordering filters to consult.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = (self.ordering,) if isinstance(self.ordering, str) else self.ordering
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by('-id' if reverse else 'id')
+        if current_position is not None:
+            queryset = queryset.filter(**{'id__lt' if self.cursor.reverse else 'id__gt': current_position})
+        results = [row async for row in queryset[offset:offset + self.page_size + 1]]
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+        return self.page
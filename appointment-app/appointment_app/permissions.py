@@ -17,4 +17,5 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the owner of the snippet.
-        return obj.client == request.user
+        # Compare ids, obj.client would load the user row.
+        return obj.client_id == request.user.id
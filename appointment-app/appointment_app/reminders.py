@@ -0,0 +1,87 @@
+import datetime
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from appointment_app.models import SLOT_LENGTH, Appointment, Reminder, ScheduleTemplate, compute_time_begin
+
+DEFAULT_HOURS = 24
+DEFAULT_CHUNK_SIZE = 500
+
+
+def longest_slot():
+    return max(ScheduleTemplate.objects.aggregate(longest=Max('duration'))['longest'] or SLOT_LENGTH, SLOT_LENGTH)
+
+
+def due_reminders(now, hours=DEFAULT_HOURS):
+    """
+    The appointments starting within `hours` of `now` that haven't been reminded of their current
+    slot, as (id, times_id, date_start, time_start, username, email) rows in start order.
+
+    Slots only store when they end, so this is one range query on the times_time_end index,
+    widened by the longest slot, with the starts checked here.
+    """
+    horizon = now + datetime.timedelta(hours=hours)
+    reminded = Reminder.objects.filter(appointment=OuterRef('pk'), times=OuterRef('times'))
+    rows = (Appointment.objects
+            .filter(times__time_end__gt=now, times__time_end__lte=horizon + longest_slot())
+            .filter(~Exists(reminded))
+            .order_by('times__time_end', 'id')
+            .values_list('id', 'times_id', 'times__date_start', 'times__time_start', 'client__username', 'client__email'))
+    return [row for row in rows.iterator(chunk_size=2000) if now < compute_time_begin(row[2], row[3]) <= horizon]
+
+
+def reminder_message(username, email, date_start, time_start):
+    return EmailMessage('Appointment Reminder',
+                        f"Hello {username} this is a reminder of your appointment on {date_start} at {time_start}",
+                        'from@example.com',
+                        [f'{email}'])
+
+
+def forget_reminders(rows):
+    """
+    Delete the Reminder rows of due_reminders() rows, so they are due again.
+    """
+    pairs = {(appointment_id, times_id) for appointment_id, times_id, *_ in rows}
+    found = Reminder.objects.filter(appointment_id__in={appointment_id for appointment_id, _ in pairs},
+                                    times_id__in={times_id for _, times_id in pairs})
+    Reminder.objects.filter(id__in=[reminder_id for reminder_id, appointment_id, times_id
+                                    in found.values_list('id', 'appointment_id', 'times_id')
+                                    if (appointment_id, times_id) in pairs]).delete()
+
+
+def send_reminders(hours=DEFAULT_HOURS, chunk_size=DEFAULT_CHUNK_SIZE, now=None, connection=None):
+    """
+    Email every client whose appointment starts within `hours`, once per slot. Returns how many
+    reminders were sent.
+
+    The due appointments come from one query and are sent chunk_size at a time with
+    send_messages() over one connection. Each chunk's Reminder rows are committed before it is
+    sent, so no transaction is held open while the mail server answers; when sending fails they
+    are deleted again and the chunk is due on the next run, so delivery is at least once. Run one
+    instance at a time, e.g. from cron.
+    """
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be at least 1, not {chunk_size}.')
+    now = now or timezone.now()
+    due = due_reminders(now, hours)
+    if not due:
+        return 0
+    sent = 0
+    connection = connection or get_connection()
+    connection.open()
+    try:
+        for first in range(0, len(due), chunk_size):
+            chunk = due[first:first + chunk_size]
+            with transaction.atomic():
+                Reminder.objects.bulk_create([Reminder(appointment_id=appointment_id, times_id=times_id)
+                                              for appointment_id, times_id, *_ in chunk], ignore_conflicts=True)
+            try:
+                sent += connection.send_messages([reminder_message(username, email, date_start, time_start)
+                                                  for _, _, date_start, time_start, username, email in chunk]) or 0
+            except Exception:
+                forget_reminders(chunk)
+                raise
+    finally:
+        connection.close()
+    return sent
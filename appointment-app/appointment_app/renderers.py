@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from appointment_app import timing
+
+try:
+    import orjson
+except ImportError: # optional, the stdlib encoder is used without it
+    orjson = None
+
+
+def fast_json_enabled():
+    return getattr(settings, 'APPOINTMENT_FAST_JSON', False)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that hands compact output to orjson when APPOINTMENT_FAST_JSON is on.
+
+    For the API's payloads (strings, ints, bools, dates and times) the bytes are the same as the
+    stock renderer's: compact separators, unescaped unicode, UTC as Z and \\u2028/\\u2029
+    escaped. Indented output for the browsable API and types orjson refuses (Decimal, non string
+    keys, huge ints) go through the stock path. Floats can be spelled differently (1e16 vs 1e+16).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing.timed('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not fast_json_enabled() or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, option=orjson.OPT_UTC_Z)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Picks ?format=csv for the export view, which streams its own body. Only error responses
+    (a dict such as {'detail': ...}) are rendered here, as a header row and a value row.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(list(data))
+        writer.writerow([str(value) for value in data.values()])
+        return buffer.getvalue().encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Picks ?format=ndjson for the export view, error responses become a single JSON line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode() + b'\n'
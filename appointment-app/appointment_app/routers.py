@@ -0,0 +1,136 @@
+import contextvars
+import random
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'appointments_primary'
+
+_reads = contextvars.ContextVar('appointment_reads', default=None)
+
+
+def read_replicas():
+    return list(getattr(settings, 'APPOINTMENT_READ_REPLICAS', []))
+
+
+def pin_seconds():
+    return getattr(settings, 'APPOINTMENT_REPLICA_PIN_SECONDS', 5)
+
+
+def pin_key(user_id):
+    return f'appointments:primary-pin:{user_id}'
+
+
+class RequestReads:
+    """
+    Where one request reads the appointment tables from.
+
+    A GET, HEAD or OPTIONS request reads from one replica, picked at random, unless the client
+    wrote recently: it has the pin cookie, its user is pinned in the cache (for clients that
+    don't keep cookies), or it already wrote during this request. Then it reads from the primary
+    so it sees its own writes.
+    """
+
+    def __init__(self, request, replicas):
+        self.request = request
+        self.replica = random.choice(replicas)
+        self.wrote = False
+        self._pinned = None if request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES else True
+
+    def pinned(self):
+        if self.wrote:
+            return True
+        if self._pinned is None:
+            from appointment_app.cache import get_cache
+
+            # DRF sets request.user once it has authenticated the request, queries made while it
+            # authenticates (e.g. the token revocation list) are decided without the user
+            user = getattr(self.request, 'user', None)
+            if user is None or not user.is_authenticated:
+                return False
+            self._pinned = bool(get_cache().get(pin_key(user.pk)))
+        return self._pinned
+
+    def pin(self, response):
+        """
+        Send reads from this client to the primary for the next APPOINTMENT_REPLICA_PIN_SECONDS.
+        """
+        from appointment_app.cache import get_cache
+
+        response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            get_cache().set(pin_key(user.pk), True, pin_seconds())
+
+
+def current_reads():
+    """
+    The RequestReads of the request being served, None outside requests or without replicas.
+    """
+    return _reads.get()
+
+
+def start_reads(request):
+    """
+    Route the reads of `request` from here on, returns a token for end_reads() or None without replicas.
+    """
+    replicas = read_replicas()
+    if not replicas:
+        return None
+    return _reads.set(RequestReads(request, replicas))
+
+
+def end_reads(token):
+    _reads.reset(token)
+
+
+def pinned_to_primary():
+    reads = current_reads()
+    return reads is not None and reads.pinned()
+
+
+def cache_timeout(timeout):
+    """
+    How long to cache what the current request read, a replica's copy may be behind so only until
+    the pins of the writes it may be missing have expired.
+    """
+    reads = current_reads()
+    if reads is None or reads.pinned():
+        return timeout
+    return min(timeout, pin_seconds())
+
+
+class ReplicaRouter:
+    """
+    Reads of the appointment_app tables go to APPOINTMENT_READ_REPLICAS during safe requests, see
+    RequestReads. Writes, everything outside requests and authentication state (sessions, users
+    and revoked tokens are read right after they are written) use the primary. Migrations only
+    run on the primary, the replicas copy its schema.
+    """
+    route_app_labels = {'appointment_app'}
+    primary_models = {'appointment_app.revokedtoken'}
+
+    def db_for_read(self, model, **hints):
+        reads = current_reads()
+        if (reads is None or model._meta.app_label not in self.route_app_labels
+                or model._meta.label_lower in self.primary_models):
+            return None
+        # explicit, else Django would follow a replica instance's _state.db after a write
+        return DEFAULT_DB_ALIAS if reads.pinned() else reads.replica
+
+    def db_for_write(self, model, **hints):
+        reads = current_reads()
+        if reads is not None:
+            reads.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in read_replicas():
+            return False
+        return None
@@ -0,0 +1,117 @@
+from django.db import IntegrityError, transaction
+from appointment_app import cache
+from appointment_app.locking import lock_slot_at
+from appointment_app.models import CHOICES_TIME_START, ScheduleException, ScheduleTemplate, Times, compute_time_end
+from appointment_app.slots import slot_dates
+
+
+class Closures:
+    """
+    The ScheduleExceptions as (template_id, date, time_start), to ask whether a template (None for
+    the slots that predate templates) is closed on a date at a start time.
+    """
+
+    def __init__(self, closed):
+        self.closed = closed
+
+    def day_closed(self, template_id, day):
+        return (None, day, None) in self.closed or (template_id is not None and (template_id, day, None) in self.closed)
+
+    def slot_closed(self, template_id, day, time_start):
+        return (self.day_closed(template_id, day) or (None, day, time_start) in self.closed
+                or (template_id is not None and (template_id, day, time_start) in self.closed))
+
+
+def load_schedule():
+    templates = list(ScheduleTemplate.objects.filter(active=True).select_related('resource').order_by('id'))
+    return templates, Closures(set(ScheduleException.objects.values_list('template_id', 'date', 'time_start')))
+
+
+def current_schedule():
+    """
+    The active templates and the Closures, read through the response cache: both are small and
+    rarely change, and saving either invalidates the cache.
+    """
+    return cache.cached('schedule', 'active', load_schedule)
+
+
+def template_slots(date_from, date_to, schedule=None):
+    """
+    The slots the active templates offer between date_from and date_to (inclusive), as
+    {(resource_id, date_start, time_start): unsaved Times} in date and time order, without the
+    closed ones.
+
+    When two templates of one calendar offer the same start time on a day the older template's
+    slot is used.
+    """
+    templates, closures = schedule or current_schedule()
+    slots = {}
+    for template in templates:
+        if template.valid_from > date_to or (template.valid_until is not None and template.valid_until < date_from):
+            continue
+        start_times = template.start_time_list()
+        last_day = min(date_to, template.valid_until) if template.valid_until else date_to
+        for day in slot_dates(max(date_from, template.valid_from), last_day, template.weekday_list()):
+            if closures.day_closed(template.id, day):
+                continue
+            for time_start in start_times:
+                key = (template.resource_id, day, time_start)
+                if key not in slots and not closures.slot_closed(template.id, day, time_start):
+                    slots[key] = Times(template=template, resource=template.resource, date_start=day, time_start=time_start,
+                                       time_end=compute_time_end(day, time_start, template.duration))
+    return dict(sorted(slots.items(), key=lambda item: slot_order(item[1])))
+
+
+def slot_order(slot):
+    # date and time, then the shared calendar before the resources
+    return slot.date_start, slot.time_start, slot.resource_id is not None, slot.resource_id or 0
+
+
+LEGACY_TIME_STARTS = frozenset(time_start for time_start, _ in CHOICES_TIME_START)
+
+
+def legacy_slot_offered(slot, closures):
+    """
+    Whether a Times row that predates the templates is still offered: its start time is one of
+    CHOICES_TIME_START and no ScheduleException closes it.
+    """
+    return (slot.template_id is None and slot.time_start in LEGACY_TIME_STARTS
+            and not closures.slot_closed(None, slot.date_start, slot.time_start))
+
+
+def slot_offered(slot, schedule=None):
+    """
+    Whether a Times row can still be booked, by the rule free_slots() lists slots with: an active
+    template offers it, or it predates the templates and is still offered, and its resource (if
+    any) is active. Capacity is checked separately.
+    """
+    schedule = schedule or current_schedule()
+    if slot.resource_id is not None and not slot.resource.active:
+        return False
+    if (slot.resource_id, slot.date_start, slot.time_start) in template_slots(slot.date_start, slot.date_start, schedule):
+        return True
+    return legacy_slot_offered(slot, schedule[1])
+
+
+def materialize_slot(date_start, time_start, resource_id=None):
+    """
+    The locked Times starting at time_start on date_start in the calendar of resource_id (None for
+    the shared one), saved now if a template offers it and it has no row yet. None when there is no
+    row and no template offers it.
+
+    Call it inside the booking's transaction, so a booking that fails takes its slot row with it.
+    Two bookers creating the same slot meet on the unique_datetime or unique_resource_datetime
+    constraint, the loser locks the winner's row instead.
+    """
+    slot = lock_slot_at(date_start, time_start, resource_id)
+    if slot is not None:
+        return slot
+    slot = template_slots(date_start, date_start).get((resource_id, date_start, time_start))
+    if slot is None:
+        return None
+    try:
+        with transaction.atomic():
+            slot.save()
+    except IntegrityError:
+        return lock_slot_at(date_start, time_start, resource_id)
+    return slot
@@ -3,9 +3,19 @@
 # Get an instance of a logger
 #log = logging.getLogger(__name__)
 import datetime
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import post_save
 from django.utils import timezone
 from rest_framework import serializers
-from appointment_app.models import Times, Appointment
+from rest_framework.exceptions import NotFound, PermissionDenied
+from appointment_app import timing
+from appointment_app.capacity import check_capacity
+from appointment_app.exceptions import SlotTaken
+from appointment_app.locking import lock_slots
+from appointment_app.models import Times, Appointment, WaitlistEntry, next_sync_seq
+from appointment_app.schedules import materialize_slot, slot_offered
+from appointment_app.slots import MAX_GENERATE_DAYS
+from appointment_app.waitlist import lock_waitlists, promote_waiters, waitlist_position
 
 CHOICES_TIME_START = (
     (datetime.time(9), datetime.time(9)),
@@ -13,44 +23,244 @@ CHOICES_TIME_START = (
     (datetime.time(11), datetime.time(11)),
 )
 
+class TimedSerializerMixin:
+    """
+    Counts validation and building .data as serialize time for the request timing middleware.
+    """
+
+    def is_valid(self, *args, **kwargs):
+        with timing.timed('serialize'):
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with timing.timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
 class TimesSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField(required=False)
-    time_start = serializers.ChoiceField(choices=CHOICES_TIME_START)
+    id = serializers.IntegerField(required=False, allow_null=True) # None for a template slot nobody has booked yet
+    time_start = serializers.TimeField(format=None) # start times come from the schedule templates
+    resource = serializers.IntegerField(source='resource_id', required=False, allow_null=True) # None for the shared calendar
     class Meta:
         model = Times
-        fields = ('id', 'time_start', 'time_end', 'date_start')
+        fields = ('id', 'time_start', 'time_end', 'date_start', 'resource')
         
 class UserSerializer(serializers.ModelSerializer):
     pass
         
         
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     times = TimesSerializer()
     client = serializers.ReadOnlyField(source='client.username')
     class Meta:
         model = Appointment
         fields = ('id', 'times', 'filled', 'client')
+        list_serializer_class = TimedListSerializer
         
+    def lock_times(self, times_data, instance=None):
+        """
+        Lock the Times row being booked and make sure it is still offered and its resource has room
+        for one more appointment then. Without an id the slot is looked up by date_start,
+        time_start and resource, and saved first if a schedule template offers it.
+        """
+        times_id = times_data.get('id')
+        if times_id is not None:
+            time = lock_slots([times_id]).get(times_id)
+            if time is None:
+                raise serializers.ValidationError({'times': [f'Slot {times_id} does not exist.']})
+        elif times_data.get('date_start') is None or times_data.get('time_start') is None:
+            raise serializers.ValidationError({'times': ['A slot id is required.']})
+        else:
+            time = materialize_slot(times_data['date_start'], times_data['time_start'], times_data.get('resource_id'))
+            if time is None:
+                raise serializers.ValidationError({'times': [f"No slot is offered on {times_data['date_start']} at {times_data['time_start']}."]})
+        if not slot_offered(time): # closed, or its template was retired, since the row was saved
+            raise serializers.ValidationError({'times': [f"No slot is offered on {time.date_start} at {time.time_start}."]})
+        check_capacity([time], excluding=[instance.pk] if instance is not None else ())
+        return time
+
+    def same_slot(self, times_data, instance):
+        if times_data.get('id') is not None:
+            return times_data['id'] == instance.times_id
+        times = instance.times
+        return ((times_data.get('date_start', times.date_start), times_data.get('time_start', times.time_start), times_data.get('resource_id', times.resource_id))
+                == (times.date_start, times.time_start, times.resource_id))
+
     def create(self, validated_data):
         times_data = validated_data.pop('times')
-        times_data_id = times_data['id']
-        time = Times.objects.get(id=times_data_id)
-        appointment = Appointment.objects.create(times=time, **validated_data)
+        with transaction.atomic():
+            time = self.lock_times(times_data)
+            try:
+                with transaction.atomic():
+                    appointment = Appointment.objects.create(times=time, **validated_data)
+            except IntegrityError:
+                # lost the race to another booker between the check and the insert
+                raise SlotTaken()
         return appointment
     
     def update(self, instance, validated_data):
+        """
+        Write the changes with one UPDATE that only matches while the appointment still belongs to
+        the client it is saved for (save(client=...), else its current one), so the owner check
+        and the write can't be split by a concurrent change. Clients can't be swapped this way.
+        """
         times_data = validated_data.pop('times')
-        instance.filled = validated_data.get('filled', instance.filled)
-        instance.client = validated_data.get('client', instance.client)
-        time_obj_id = times_data.get('id', instance.times.id)
-        if instance.times.id != time_obj_id:
-            times_obj = Times.objects.get(id=times_data.get('id'))
-            instance.times = times_obj
-            instance.save()
-        else:
-            instance.save()
+        client = validated_data.get('client')
+        owner_id = client.pk if client is not None else instance.client_id
+        with transaction.atomic():
+            if self.same_slot(times_data, instance):
+                times, waitlists = instance.times, None
+            else:
+                times = self.lock_times(times_data, instance)
+                waitlists = lock_waitlists([instance.times_id]) # before next_sync_seq() locks the SyncCounter
+            fields = {'times': times, 'filled': validated_data.get('filled', instance.filled),
+                      'modified': timezone.now(), 'updated_seq': next_sync_seq()}
+            try:
+                updated = Appointment.objects.filter(pk=instance.pk, client_id=owner_id).update(**fields)
+            except IntegrityError:
+                raise SlotTaken()
+            if not updated:
+                if Appointment.objects.filter(pk=instance.pk).exists():
+                    raise PermissionDenied('You can only change your own appointments.')
+                raise NotFound()
+            old_times_id = instance.times_id
+            for field, value in fields.items():
+                setattr(instance, field, value)
+            if client is not None:
+                instance.client = client
+            # update() sends no signals, these receivers invalidate the cache and announce a move
+            post_save.send(sender=Appointment, instance=instance, created=False, update_fields=set(fields),
+                           raw=False, using=router.db_for_write(Appointment))
+            if waitlists is not None and instance.times_id != old_times_id:
+                promote_waiters(waitlists)
         return instance
 
+
+
+# The lean read-only path: the same JSON as AppointmentSerializer(many=True) built straight from
+# .values() rows, without a model instance or a serializer field per value.
+APPOINTMENT_VALUES = ('id', 'filled', 'client__username', 'times__id', 'times__time_start', 'times__time_end', 'times__date_start', 'times__resource_id')
+
+
+def datetime_representation(value):
+    # what DateTimeField.to_representation does with the ISO 8601 format
+    if not value:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def lean_appointment(row):
+    """
+    Turn a row from queryset.values(*APPOINTMENT_VALUES) into the dict AppointmentSerializer would give.
+    """
+    return {
+        'id': row['id'],
+        'times': {
+            'id': row['times__id'],
+            'time_start': row['times__time_start'].isoformat() if row['times__time_start'] is not None else None,
+            'time_end': datetime_representation(row['times__time_end']),
+            'date_start': row['times__date_start'].isoformat() if row['times__date_start'] is not None else None,
+            'resource': row['times__resource_id'],
+        },
+        'filled': row['filled'],
+        'client': row['client__username'],
+    }
+
+
+def lean_appointments(rows):
+    with timing.timed('serialize'):
+        return [lean_appointment(row) for row in rows]
+
+
+MAX_BATCH_OPERATIONS = 200
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    op = serializers.ChoiceField(choices=(CREATE, UPDATE, DELETE))
+    id = serializers.IntegerField(required=False) # the appointment, for update and delete
+    times = TimesSerializer(required=False)
+    filled = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data['op'] in (self.UPDATE, self.DELETE) and 'id' not in data:
+            raise serializers.ValidationError({'id': f"An appointment id is required to {data['op']}."})
+        if data['op'] == self.CREATE and 'times' not in data:
+            raise serializers.ValidationError({'times': ['A slot id is required.']})
+        return data
+
+
+def slot_key(times_data):
+    # a slot is named by its id, or by its calendar, date and start time if it may not have a row yet
+    if times_data.get('id') is not None:
+        return times_data['id']
+    return (times_data.get('resource_id'), times_data.get('date_start'), times_data.get('time_start'))
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise serializers.ValidationError(f'A batch can have at most {MAX_BATCH_OPERATIONS} operations.')
+        appointment_ids = [operation['id'] for operation in operations if operation['op'] != BatchOperationSerializer.CREATE]
+        if len(appointment_ids) != len(set(appointment_ids)):
+            raise serializers.ValidationError('Each appointment can only appear once in a batch.')
+        slots = [slot_key(operation['times']) for operation in operations
+                 if operation['op'] != BatchOperationSerializer.DELETE and 'times' in operation]
+        if len(slots) != len(set(slots)):
+            raise serializers.ValidationError('Each slot can only be booked once in a batch.')
+        return operations
+
+
+class GenerateSlotsSerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    weekdays = serializers.ListField(child=serializers.IntegerField(min_value=0, max_value=6), required=False) # Monday is 0
+    start_times = serializers.ListField(child=serializers.ChoiceField(choices=CHOICES_TIME_START), required=False)
+
+    def validate(self, data):
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_to': 'date_to must not be before date_from.'})
+        if (data['date_to'] - data['date_from']).days >= MAX_GENERATE_DAYS:
+            raise serializers.ValidationError({'date_to': f'Slots can be generated for at most {MAX_GENERATE_DAYS} days at a time.'})
+        return data
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    position = serializers.SerializerMethodField() # 1 is promoted next
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ('id', 'times', 'priority', 'created', 'position')
+        read_only_fields = fields
+
+    def get_position(self, entry):
+        return waitlist_position(entry)
+
+
+class TokenObtainSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False)
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
 # https://www.youtube.com/watch?v=EyMFf9O6E60
 
 # when doing put request it is going through but when doing get request it is just reverting back just for the times thing
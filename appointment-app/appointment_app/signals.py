@@ -0,0 +1,111 @@
+import contextlib
+import contextvars
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from appointment_app import cache
+from appointment_app.availability import SLOT_FREED, SLOT_TAKEN, announce
+from appointment_app.models import Appointment, Resource, ScheduleException, ScheduleTemplate, Times, Tombstone, next_sync_seq
+
+
+_quiet_deletes = contextvars.ContextVar('appointment_quiet_deletes', default=False)
+
+
+@contextlib.contextmanager
+def quiet_deletes():
+    """
+    Skip the slot events and cache invalidation of the rows deleted in the block, for deletes that
+    aren't cancellations, like archiving. The caller invalidates the cache itself. Tombstones are
+    still written, combine it with batched_tombstones() for queryset deletes.
+    """
+    token = _quiet_deletes.set(True)
+    try:
+        yield
+    finally:
+        _quiet_deletes.reset(token)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Times)
+@receiver(post_delete, sender=Times)
+@receiver(post_save, sender=ScheduleTemplate)
+@receiver(post_delete, sender=ScheduleTemplate)
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+@receiver(post_save, sender=Resource) # capacity and active, and current_schedule() keeps template.resource
+@receiver(post_delete, sender=Resource)
+def invalidate_cached_responses(sender, **kwargs):
+    # covers the serializers, the admin and the shell, bulk paths call cache.invalidate() themselves
+    if _quiet_deletes.get():
+        return
+    cache.invalidate()
+
+
+@receiver(post_init, sender=Appointment)
+def remember_slot(sender, instance, **kwargs):
+    instance._saved_times_id = instance.times_id
+
+
+@receiver(post_save, sender=Appointment)
+def announce_saved_slot(sender, instance, created, raw=False, **kwargs):
+    # bulk_create and bulk_update send no signals, apply_batch announces its own changes
+    if raw:
+        return
+    if created:
+        announce(SLOT_TAKEN, [instance.times_id])
+    elif instance.times_id != instance._saved_times_id: # moved to another slot
+        announce(SLOT_FREED, [instance._saved_times_id])
+        announce(SLOT_TAKEN, [instance.times_id])
+    instance._saved_times_id = instance.times_id
+
+
+@receiver(post_delete, sender=Appointment)
+def announce_deleted_slot(sender, instance, **kwargs):
+    if _quiet_deletes.get():
+        return
+    announce(SLOT_FREED, [instance.times_id])
+
+
+_pending_tombstones = contextvars.ContextVar('appointment_pending_tombstones', default=None)
+
+
+@contextlib.contextmanager
+def batched_tombstones():
+    """
+    Collect the tombstones of the rows deleted in the block, cascades included, and write them
+    with one seq and one INSERT when it ends instead of a seq and an INSERT per row. Use it inside
+    the deleting transaction, for queryset deletes.
+    """
+    pending = []
+    token = _pending_tombstones.set(pending)
+    try:
+        yield
+    finally:
+        _pending_tombstones.reset(token)
+    if pending:
+        seq = next_sync_seq() # deleted together, so never split by /appointments/changes/
+        Tombstone.objects.bulk_create([Tombstone(model=model, object_id=object_id, updated_seq=seq) for model, object_id in pending])
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=Times)
+def record_tombstone(sender, instance, **kwargs):
+    # runs inside the delete's transaction, so the seq is committed with the delete
+    model = Tombstone.APPOINTMENT if sender is Appointment else Tombstone.TIMES
+    pending = _pending_tombstones.get()
+    if pending is not None:
+        pending.append((model, instance.pk))
+        return
+    Tombstone.objects.create(model=model, object_id=instance.pk, updated_seq=next_sync_seq())
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # per connection settings, journal_mode=wal is stored in the file but the others aren't
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'APPOINTMENT_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,77 @@
+import datetime
+from django.db import transaction
+from appointment_app import cache
+from appointment_app.models import Times, CHOICES_TIME_START, compute_time_end, next_sync_seq
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+FULL_WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+DEFAULT_BATCH_SIZE = 500
+MAX_GENERATE_DAYS = 366
+
+
+def slot_dates(date_from, date_to, weekdays=None):
+    """
+    Yield every date from date_from to date_to (inclusive) whose weekday (Monday is 0) is in weekdays.
+    """
+    weekdays = set(range(7) if weekdays is None else weekdays)
+    day = date_from
+    while day <= date_to:
+        if day.weekday() in weekdays:
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+def build_slots(date_from, date_to, weekdays=None, start_times=None):
+    """
+    Yield unsaved Times for every start time on every matching date, with time_end already filled in.
+
+    bulk_create skips Times.save(), so time_end is worked out here for the whole range instead.
+    """
+    if start_times is None:
+        start_times = [time_start for time_start, _ in CHOICES_TIME_START]
+    start_times = sorted(set(start_times))
+    for day in slot_dates(date_from, date_to, weekdays):
+        for time_start in start_times:
+            yield Times(time_start=time_start, date_start=day, time_end=compute_time_end(day, time_start))
+
+
+def generate_slots(date_from, date_to, weekdays=None, start_times=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create the Times for a date range with bulk INSERTs and return how many new rows were added.
+
+    Slots that already exist are skipped by the unique_datetime constraint (ignore_conflicts), so
+    running it twice over the same range is harmless.
+    """
+    in_range = Times.objects.filter(date_start__gte=date_from, date_start__lte=date_to)
+    before = in_range.count()
+    with transaction.atomic():
+        seq = next_sync_seq() # one for the whole range, it commits as a unit
+        batch = []
+        for slot in build_slots(date_from, date_to, weekdays, start_times):
+            slot.updated_seq = seq
+            batch.append(slot)
+            if len(batch) >= batch_size:
+                Times.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Times.objects.bulk_create(batch, ignore_conflicts=True)
+    cache.invalidate() # new free slots, and bulk_create sends no signals
+    return in_range.count() - before
+
+
+def parse_weekdays(value):
+    """
+    Turn 'mon,wed,fri', 'monday,wednesday,friday' or '0,2,4' into [0, 2, 4].
+    """
+    weekdays = []
+    for part in value.split(','):
+        part = part.strip().lower()
+        if part.isdigit() and int(part) < 7:
+            weekdays.append(int(part))
+        elif part in WEEKDAY_NAMES:
+            weekdays.append(WEEKDAY_NAMES.index(part))
+        elif part in FULL_WEEKDAY_NAMES:
+            weekdays.append(FULL_WEEKDAY_NAMES.index(part))
+        else:
+            raise ValueError(f"'{part}' is not a weekday, use mon..sun or 0..6.")
+    return weekdays
@@ -0,0 +1,53 @@
+import asyncio
+from django.conf import settings
+from appointment_app.broker import get_broker
+from appointment_app.renderers import FastJSONRenderer
+
+RETRY_MILLISECONDS = 3000
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'APPOINTMENT_SSE_HEARTBEAT', 15)
+
+
+def max_stream_seconds():
+    return getattr(settings, 'APPOINTMENT_SSE_MAX_SECONDS', 300)
+
+
+def format_event(message_id, event, data):
+    """
+    One Server-Sent Events message, data is JSON as the API renders it.
+    """
+    lines = []
+    if message_id is not None:
+        lines.append(f'id: {message_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + FastJSONRenderer().render(data).decode())
+    return '\n'.join(lines) + '\n\n'
+
+
+async def slot_events(date_from=None, date_to=None):
+    """
+    Yield slot taken/freed events (and resync when this subscriber fell behind) as SSE text.
+
+    A comment goes out every APPOINTMENT_SSE_HEARTBEAT seconds so proxies keep the connection
+    open. The stream ends after APPOINTMENT_SSE_MAX_SECONDS and EventSource reconnects, which
+    also bounds how long a subscriber whose client vanished unnoticed is kept around.
+    """
+    loop = asyncio.get_running_loop()
+    subscription = get_broker().subscribe()
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        deadline = loop.time() + max_stream_seconds()
+        while (remaining := deadline - loop.time()) > 0:
+            message = await subscription.next(min(heartbeat_seconds(), remaining))
+            if message is None:
+                yield ': keep-alive\n\n'
+                continue
+            message_id, event, data = message
+            day = data.get('date_start')
+            if day and ((date_from and day < date_from.isoformat()) or (date_to and day > date_to.isoformat())):
+                continue
+            yield format_event(message_id, event, data)
+    finally:
+        subscription.close()
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from rest_framework.exceptions import ValidationError
+from appointment_app.exceptions import ResyncRequired
+from appointment_app.models import Appointment, SyncCounter, Times, Tombstone
+from appointment_app.serializers import APPOINTMENT_VALUES, TimesSerializer, lean_appointments
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+
+def parse_since(value):
+    """
+    The seq a ?since= token stands for, -1 (everything) when it is missing.
+    """
+    if value in (None, ''):
+        return -1
+    if not value.isdigit():
+        raise ValidationError({'since': f"'{value}' is not a sync token, use the next value of a previous response."})
+    return int(value)
+
+
+def changed_up_to(querysets, since, head, limit):
+    """
+    The highest seq that keeps every source at about `limit` rows, or head if they all fit.
+
+    Rows sharing a seq were committed together and are never split, so a single change bigger
+    than limit is sent whole.
+    """
+    bound = head
+    for queryset in querysets:
+        overflow = list(queryset.order_by('updated_seq').values_list('updated_seq', flat=True)[limit:limit + 1])
+        if overflow:
+            bound = min(bound, overflow[0] - 1 if overflow[0] - 1 > since else overflow[0])
+    return bound
+
+
+def changes_since(since=-1, limit=DEFAULT_CHANGES_LIMIT):
+    """
+    Everything inserted, updated or deleted after seq `since`, up to `limit` rows per kind.
+
+    Returns appointments and times as the API shows them, the ids deleted since, and the token to
+    send next time. The head of the counter is read first: later writers get higher seqs and
+    commit after this read, so nothing at or below the returned token can still turn up.
+    """
+    counter = SyncCounter.objects.filter(pk=1).values('value', 'pruned_through').first() or {'value': 0, 'pruned_through': 0}
+    if 0 <= since < counter['pruned_through']:
+        raise ResyncRequired()
+    head = counter['value']
+
+    def changed(queryset):
+        return queryset.filter(updated_seq__gt=since, updated_seq__lte=head)
+
+    bound = changed_up_to([changed(Appointment.objects.all()), changed(Times.objects.all()), changed(Tombstone.objects.all())],
+                          since, head, limit)
+    window = {'updated_seq__gt': since, 'updated_seq__lte': bound}
+    appointments = Appointment.objects.filter(**window).order_by('updated_seq', 'id').values(*APPOINTMENT_VALUES)
+    times = Times.objects.filter(**window).order_by('updated_seq', 'id')
+    deleted = {Tombstone.APPOINTMENT: [], Tombstone.TIMES: []}
+    for model, object_id in Tombstone.objects.filter(**window).order_by('updated_seq', 'id').values_list('model', 'object_id'):
+        deleted[model].append(object_id)
+    return {
+        'appointments': lean_appointments(appointments),
+        'times': TimesSerializer(times, many=True).data,
+        'deleted': {'appointments': deleted[Tombstone.APPOINTMENT], 'times': deleted[Tombstone.TIMES]},
+        'next': str(max(bound, since, 0)),
+        'more': bound < head,
+    }
+
+
+def prune_tombstones(before):
+    """
+    Delete the tombstones created before `before` and return how many went.
+
+    Clients whose token is older than the newest pruned tombstone get ResyncRequired, since they
+    could have missed those deletes.
+    """
+    with transaction.atomic():
+        newest = Tombstone.objects.filter(created__lt=before).aggregate(newest=Max('updated_seq'))['newest']
+        if newest is None:
+            return 0
+        deleted, _ = Tombstone.objects.filter(updated_seq__lte=newest).delete()
+        SyncCounter.objects.get_or_create(pk=1)
+        SyncCounter.objects.filter(pk=1).update(pruned_through=Greatest(F('pruned_through'), newest))
+    return deleted
@@ -0,0 +1,77 @@
+import contextlib
+import contextvars
+import time
+
+_current = contextvars.ContextVar('appointment_timing', default=None)
+
+
+class Recording:
+    """
+    Time spent per phase (db, serialize, render, mail) during one sampled request, in seconds.
+
+    Phases can overlap: a lazy queryset evaluated while serializing counts towards both db and
+    serialize. A phase entered again while it is already running (a nested serializer) is only
+    timed once, by the outermost block.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counts = {}
+        self._active = set()
+
+    def add(self, name, seconds, count=1):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        """
+        For connection.execute_wrapper(): count and time every query.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def current():
+    """
+    The Recording for the request being handled, or None if it isn't sampled.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def recording():
+    """
+    Make a new Recording current for the duration of the block.
+    """
+    new = Recording()
+    token = _current.set(new)
+    try:
+        yield new
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to phase `name` of the current recording, if there is one.
+    Costs one context variable lookup when the request isn't sampled.
+    """
+    active = _current.get()
+    if active is None or name in active._active:
+        yield
+        return
+    active._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        active._active.discard(name)
+        active.add(name, time.perf_counter() - started)
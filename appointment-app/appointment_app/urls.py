@@ -1,10 +1,23 @@
 from django.urls import path
-from appointment_app.views import appointment_list, appointment_detail
+from appointment_app.views import appointment_list, appointment_detail, appointment_list_async, appointment_detail_async, appointment_batch, appointment_changes, appointment_export, availability, availability_stream, cache_statistics, generate_times, times_waitlist, token_obtain, token_refresh, token_revoke
 from rest_framework.urlpatterns import format_suffix_patterns
 
 urlpatterns = [
     path('appointments/', appointment_list),
     path('appointments/<int:pk>/', appointment_detail),
+    path('async/appointments/', appointment_list_async),
+    path('async/appointments/<int:pk>/', appointment_detail_async),
+    path('appointments/batch/', appointment_batch),
+    path('appointments/export/', appointment_export),
+    path('appointments/changes/', appointment_changes),
+    path('availability/', availability),
+    path('availability/stream/', availability_stream),
+    path('times/generate/', generate_times),
+    path('times/<int:pk>/waitlist/', times_waitlist),
+    path('cache/stats/', cache_statistics),
+    path('auth/token/', token_obtain),
+    path('auth/token/refresh/', token_refresh),
+    path('auth/token/revoke/', token_revoke),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
@@ -2,74 +2,422 @@
 
 # Get an instance of a logger
 #log = logging.getLogger(__name__)
+import datetime
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib.auth import authenticate
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.http import condition
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from appointment_app.models import Times, Appointment
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from appointment_app import authentication as tokens
+from appointment_app.archive import ARCHIVE_VALUES, archived_row
+from appointment_app.availability import availability_window, free_slots_by_date
+from appointment_app.batch import apply_batch
+from appointment_app.capacity import has_room
+from appointment_app import cache as appointment_cache
+from appointment_app import conditional
+from appointment_app.export import stream_csv, stream_ndjson
+from appointment_app.filters import filter_appointments, parse_date_param, wants_archive
+from appointment_app.locking import lock_slots
+from appointment_app.models import Times, Appointment, ArchivedAppointment, WaitlistEntry
+from appointment_app.outbox import queue_mail
+from appointment_app.pagination import AppointmentCursorPagination
 from appointment_app.permissions import IsOwnerOrReadOnly
-from appointment_app.serializers import AppointmentSerializer,TimesSerializer
-from django.core.mail import send_mail
+from appointment_app.renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer, fast_json_enabled
+from appointment_app.serializers import APPOINTMENT_VALUES, AppointmentSerializer, BatchSerializer, GenerateSlotsSerializer, TimesSerializer, TokenObtainSerializer, TokenRefreshSerializer, WaitlistEntrySerializer, lean_appointment, lean_appointments
+from appointment_app.slots import generate_slots
+from appointment_app.sse import slot_events
+from appointment_app.sync import DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT, changes_since, parse_since
+from appointment_app.waitlist import lock_waitlists, promote_waiters
+from django.db import transaction
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=conditional.list_etag)
 def appointment_list(request, format=None):
     """
     List all code appointments, or create a new snippet.
+
+    The list is cursor paginated and can be filtered with ?date_from=, ?date_to= and ?owner=.
+    ?archived=true lists the appointments archive_past has moved out instead.
+    GETs carry an ETag worked out from the sync counter's head, so a client that sends
+    If-None-Match gets a 304 without the rows being loaded or serialized.
     """
     if request.method == 'GET':
-        appointments = Appointment.objects.all()
-        serializer = AppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
+        def list_page():
+            paginator = AppointmentCursorPagination()
+            if wants_archive(request.query_params):
+                rows = filter_appointments(ArchivedAppointment.objects.values(*ARCHIVE_VALUES), request.query_params)
+                page = paginator.paginate_queryset(rows, request)
+                return paginator.get_paginated_response(lean_appointments(archived_row(row) for row in page)).data
+            if fast_json_enabled():
+                rows = filter_appointments(Appointment.objects.values(*APPOINTMENT_VALUES), request.query_params)
+                return paginator.get_paginated_response(lean_appointments(paginator.paginate_queryset(rows, request))).data
+            appointments = filter_appointments(Appointment.objects.select_related('times', 'client'), request.query_params)
+            page = paginator.paginate_queryset(appointments, request)
+            serializer = AppointmentSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+        return Response(appointment_cache.cached('list', request.build_absolute_uri(), list_page))
 
     elif request.method == 'POST':
         serializer = AppointmentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(client_id = request.user.id)
-            send_mail('New Appointment',
-                      f"Hello {request.user.username} you have booked an appointment on {request.data['times']['date_start']} at {request.data['times']['time_start']}",
-                      'from@example.com',
-                      [f'{request.user.email}'],
-                      fail_silently=False)
+            with transaction.atomic():
+                serializer.save(client_id = request.user.id)
+                queue_mail('New Appointment',
+                           f"Hello {request.user.username} you have booked an appointment on {request.data['times']['date_start']} at {request.data['times']['time_start']}",
+                           'from@example.com',
+                           [f'{request.user.email}'])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsOwnerOrReadOnly, IsAuthenticated])
+@condition(etag_func=conditional.detail_etag, last_modified_func=conditional.detail_last_modified)
 def appointment_detail(request, pk, format=None):
     """
     Retrieve, update or delete a code appointment.
-    """
-    try:
-        appointment = Appointment.objects.get(pk=pk)
-    except Appointment.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
 
+    Writes load the appointment and its slot in one query and check the owner by client_id, the
+    user row is never loaded. PUT saves with an UPDATE that only matches while the requester still
+    owns the appointment, DELETE likewise, see delete_appointment(). GET with ?archived=true reads
+    an archived appointment.
+    """
     if request.method == 'GET':
-        serializer = AppointmentSerializer(appointment)
-        return Response(serializer.data)
+        def appointment_data():
+            appointment = Appointment.objects.select_related('times', 'client').filter(pk=pk).first()
+            return AppointmentSerializer(appointment).data if appointment else None
+        def archived_data():
+            row = ArchivedAppointment.objects.filter(pk=pk).values(*ARCHIVE_VALUES).first()
+            return lean_appointment(archived_row(row)) if row else None
+        if wants_archive(request.query_params):
+            data = appointment_cache.cached('archived', pk, archived_data)
+        else:
+            data = appointment_cache.cached('detail', pk, appointment_data)
+        if data is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+    if request.method == 'DELETE':
+        return delete_appointment(request, pk)
+
+    appointment = Appointment.objects.select_related('times').filter(pk=pk).first()
+    if appointment is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    # function views don't run object permissions themselves
+    if not IsOwnerOrReadOnly().has_object_permission(request, None, appointment):
+        raise PermissionDenied('You can only change your own appointments.')
 
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = AppointmentSerializer(appointment, data=request.data)
         if serializer.is_valid():
-            serializer.save(client=request.user)
-            send_mail('Changed Appointment',
-                      f"Hello {request.user.username} you have changed your appointment from  {appointment.times.date_start} at {appointment.times.time_start} to {request.data['times']['date_start']} at {request.data['times']['time_start']}",
-                      'from@example.com',
-                      [f'{request.user.email}'],
-                      fail_silently=False)
+            old_times = appointment.times
+            with transaction.atomic():
+                serializer.save(client=request.user)
+                queue_mail('Changed Appointment',
+                           f"Hello {request.user.username} you have changed your appointment from  {old_times.date_start} at {old_times.time_start} to {appointment.times.date_start} at {appointment.times.time_start}",
+                           'from@example.com',
+                           [f'{request.user.email}'])
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+def delete_appointment(request, pk):
+    """
+    The DELETE of appointment_detail. The DELETE itself only matches while the requester owns the
+    appointment, so one taken over or deleted since the read is left alone. A queryset delete
+    still sends post_delete, which writes the tombstone and announces the freed slot.
+    """
+    row = Appointment.objects.filter(pk=pk).values('client_id', 'times_id', 'times__date_start', 'times__time_start').first()
+    if row is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if row['client_id'] != request.user.id:
+        raise PermissionDenied('You can only change your own appointments.')
+    with transaction.atomic():
+        waitlists = lock_waitlists([row['times_id']]) # before the tombstone locks the SyncCounter
+        _, deleted = Appointment.objects.filter(pk=pk, client_id=request.user.id).delete()
+        if not deleted.get(Appointment._meta.label):
+            if Appointment.objects.filter(pk=pk).exists():
+                raise PermissionDenied('You can only change your own appointments.')
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        queue_mail('Deleted Appointment',
+                   f"Hello {request.user.username} you have deleted an appointment on {row['times__date_start']} at {row['times__time_start']}",
+                   'from@example.com',
+                   [f'{request.user.email}'])
+        promote_waiters(waitlists)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def appointment_batch(request, format=None):
+    """
+    Create, update and delete several of your appointments at once, all or nothing.
+    """
+    serializer = BatchSerializer(data=request.data)
+    if serializer.is_valid():
+        created, updated, deleted = apply_batch(request.user, serializer.validated_data['operations'])
+        return Response({'created': AppointmentSerializer(created, many=True).data,
+                         'updated': AppointmentSerializer(updated, many=True).data,
+                         'deleted': deleted})
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def appointment_changes(request, format=None):
+    """
+    What changed since ?since=<token>: appointments and slots added or updated, ids deleted, and
+    the token to ask with next time. Leave since out to start a copy from scratch, and keep asking
+    with next while more is true. ?limit= caps the rows per kind (default 500).
+    """
+    since = parse_since(request.query_params.get('since'))
+    try:
+        limit = min(max(int(request.query_params.get('limit', DEFAULT_CHANGES_LIMIT)), 1), MAX_CHANGES_LIMIT)
+    except ValueError:
+        return Response({'limit': ['A whole number is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(changes_since(since, limit))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVRenderer, NDJSONRenderer])
+def appointment_export(request, format=None):
+    """
+    Stream every appointment matching the list filters as ?format=csv (default) or ?format=ndjson,
+    or with ?archived=true every archived one.
+    """
+    model = ArchivedAppointment if wants_archive(request.query_params) else Appointment
+    appointments = filter_appointments(model.objects.all(), request.query_params)
+    if request.accepted_renderer.format == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(appointments), content_type=NDJSONRenderer.media_type)
+    else:
+        response = StreamingHttpResponse(stream_csv(appointments), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="appointments.{request.accepted_renderer.format}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def availability(request, format=None):
+    """
+    List the free slots between ?date_from= and ?date_to= (inclusive, defaults to the next week).
+    """
+    date_from, date_to = availability_window(parse_date_param(request.query_params, 'date_from'),
+                                             parse_date_param(request.query_params, 'date_to'))
+    days = [date_from + datetime.timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    per_day = appointment_cache.cached_per_date('availability', days, free_slots_by_date)
+    return Response([slot for slots in per_day for slot in slots])
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_statistics(request, format=None):
+    """
+    Hit and miss counters of the response cache in this process.
+    """
+    return Response(appointment_cache.cache_stats())
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def generate_times(request, format=None):
+    """
+    Bulk create the slots for a date range, optionally only on some weekdays and start times.
+    """
+    serializer = GenerateSlotsSerializer(data=request.data)
+    if serializer.is_valid():
+        created = generate_slots(**serializer.validated_data)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def times_waitlist(request, pk, format=None):
+    """
+    Your place on the waitlist of a full slot: GET it, POST to join, DELETE to leave. When an
+    appointment on the slot is cancelled or moved away the first waiter is booked onto it and
+    emailed, so there is nothing to race for.
+    """
+    entry = WaitlistEntry.objects.filter(times_id=pk, client_id=request.user.id).first()
+    if request.method == 'GET':
+        if entry is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(WaitlistEntrySerializer(entry).data)
+
     elif request.method == 'DELETE':
-        send_mail('Deleted Appointment',
-                      f"Hello {request.user.username} you have deleted an appointment on {appointment.times.date_start} at {appointment.times.time_start}",
-                      'from@example.com',
-                      [f'{request.user.email}'],
-                      fail_silently=False)
-        appointment.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)    
+        if entry is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        entry.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if entry is not None:
+        return Response(WaitlistEntrySerializer(entry).data)
+    with transaction.atomic():
+        slot = lock_slots([pk]).get(pk) # a cancellation promoting waiters locks it too
+        if slot is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if Appointment.objects.filter(times=slot, client_id=request.user.id).exists():
+            return Response({'times': ['You already have an appointment on this slot.']}, status=status.HTTP_400_BAD_REQUEST)
+        if has_room(slot):
+            return Response({'times': ['This slot has room, book it instead.']}, status=status.HTTP_400_BAD_REQUEST)
+        entry = WaitlistEntry.objects.create(times=slot, client_id=request.user.id)
+    return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@authentication_classes([tokens.SignedTokenAuthentication]) # so failures are a 401 with a Bearer challenge
+@permission_classes([AllowAny])
+def token_obtain(request, format=None):
+    """
+    Swap a username and password for an access token (send it as Authorization: Bearer <access>)
+    and a refresh token. The password is hashed once here instead of on every request.
+    """
+    serializer = TokenObtainSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user = authenticate(request._request, **serializer.validated_data)
+    if user is None:
+        raise AuthenticationFailed('Invalid username or password.')
+    return Response(tokens.issue_tokens(user))
+
+
+@api_view(['POST'])
+@authentication_classes([tokens.SignedTokenAuthentication])
+@permission_classes([AllowAny])
+def token_refresh(request, format=None):
+    """
+    Swap a refresh token for a new access and refresh token, the one sent can't be used again.
+    """
+    serializer = TokenRefreshSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(tokens.refresh_tokens(serializer.validated_data['refresh']))
+
+
+@api_view(['POST'])
+@authentication_classes([tokens.SignedTokenAuthentication])
+@permission_classes([AllowAny])
+def token_revoke(request, format=None):
+    """
+    Log out a token client: revoke its refresh token, and the access token it authenticates with if any.
+    """
+    serializer = TokenRefreshSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    tokens.revoke(serializer.validated_data['refresh'], tokens.REFRESH)
+    if request.auth is not None:
+        tokens.revoke_payload(request.auth, tokens.ACCESS)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+# Async versions of appointment_list and appointment_detail for ASGI. A plain JSON GET from a
+# session authenticated user is answered on the event loop with the async ORM and the lean
+# .values() rows (the same JSON as the serializer). Everything else (writes, token or basic auth, the
+# browsable API, conditional GETs, bad filters) is handed to the sync DRF view in a worker
+# thread, so behaviour matches the sync API exactly. Mail never blocks either way, the views
+# only queue it in the outbox.
+
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+async def session_user(request):
+    """
+    The session authenticated user, or None. request.user is lazy and hits the database, so it
+    is resolved in a worker thread.
+    """
+    return await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+
+def needs_sync_view(request, format=None):
+    # format is the .json/.api suffix format_suffix_patterns passes, ?format= the query parameter
+    accept = request.headers.get('Accept', '')
+    return (request.method != 'GET' or format is not None or 'format' in request.GET or 'text/html' in accept
+            or wants_archive(request.GET) or any(header in request.headers for header in CONDITIONAL_HEADERS))
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    response = HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+async def with_validators(response, validators):
+    """
+    Add the ETag and Last-Modified the sync view's @condition would send, worked out in a worker
+    thread from the same conditional validators, so the client's next GET can be conditional.
+    """
+    etag, last_modified = await sync_to_async(validators)()
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+async def appointment_list_async(request, format=None):
+    """
+    appointment_list for ASGI.
+    """
+    if needs_sync_view(request, format) or await session_user(request) is None:
+        return await sync_to_async(appointment_list)(request, format=format)
+    try:
+        rows = filter_appointments(Appointment.objects.values(*APPOINTMENT_VALUES), request.GET)
+    except ValidationError:
+        return await sync_to_async(appointment_list)(request, format=format)
+
+    async def list_page():
+        paginator = AppointmentCursorPagination()
+        page = await paginator.apaginate_queryset(rows, Request(request))
+        return paginator.get_paginated_response(lean_appointments(page)).data
+    response = json_response(await appointment_cache.acached('list', request.build_absolute_uri(), list_page))
+    return await with_validators(response, lambda: conditional.list_validators(Request(request)))
+appointment_list_async.csrf_exempt = True # as for @api_view, DRF checks CSRF for session auth itself
+
+
+async def appointment_detail_async(request, pk, format=None):
+    """
+    appointment_detail for ASGI.
+    """
+    if needs_sync_view(request, format) or await session_user(request) is None:
+        return await sync_to_async(appointment_detail)(request, pk, format=format)
+
+    async def appointment_data():
+        row = await Appointment.objects.values(*APPOINTMENT_VALUES).filter(pk=pk).afirst()
+        return lean_appointment(row) if row else None
+    data = await appointment_cache.acached('detail', pk, appointment_data)
+    if data is None:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    return await with_validators(json_response(data), lambda: conditional.detail_validators(Request(request), pk))
+appointment_detail_async.csrf_exempt = True
+
+
+async def availability_stream(request, format=None):
+    """
+    Server-Sent Events for slots being taken and freed, only between ?date_from= and ?date_to= if given.
+
+    ASGI only, under WSGI every open stream would hold a worker thread.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if 'wsgi.version' in request.META:
+        return json_response({'detail': 'The availability stream is only served over ASGI.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    if await session_user(request) is None:
+        return json_response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        date_from = parse_date_param(request.GET, 'date_from')
+        date_to = parse_date_param(request.GET, 'date_to')
+    except ValidationError as exc:
+        return json_response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(slot_events(date_from, date_to), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # don't let nginx buffer the stream
+    return response
 
 
 '''
@@ -0,0 +1,72 @@
+from itertools import groupby
+from django.db.models import Q
+from appointment_app.capacity import SHARED_CAPACITY, IntervalIndex, calendar_indexes, lock_calendars, slot_interval
+from appointment_app.locking import lock_slots
+from appointment_app.models import Appointment, WaitlistEntry
+from appointment_app.outbox import queue_mail
+
+WAITLIST_ORDER = ('-priority', 'created', 'id')
+
+
+def lock_waitlists(times_ids):
+    """
+    Lock the slots in times_ids, and the calendars of those clients wait on, for promote_waiters().
+    Returns (slots, waiting entries, capacities).
+
+    Call it before the write that frees the slots. A booking locks its slot, then its calendar,
+    and then the SyncCounter when the appointment is saved; a cancellation or a move bumps the
+    counter with its write, so it has to take the slot and calendar locks first as well, or it
+    deadlocks on PostgreSQL with a booking of the slot it frees.
+    """
+    slots = lock_slots({times_id for times_id in times_ids if times_id is not None})
+    waiting = list(WaitlistEntry.objects.filter(times_id__in=list(slots)).select_related('client')
+                   .order_by('times_id', *WAITLIST_ORDER)) if slots else []
+    capacities = lock_calendars([slots[times_id] for times_id in sorted({entry.times_id for entry in waiting})]) if waiting else {}
+    return slots, waiting, capacities
+
+
+def promote_waiters(locked):
+    """
+    Book the slots locked by lock_waitlists() for the clients waiting on them, highest priority
+    first and then first come, for as long as each slot has room. Returns the new appointments.
+
+    Call it in the transaction that cancelled or moved the appointments, after the write: the
+    place goes straight to the next waiter with one INSERT, instead of to whichever of the
+    clients racing to re-book it gets there first while the rest get conflicts. Each promoted
+    client gets an email through the outbox.
+    """
+    slots, waiting, capacities = locked
+    if not waiting:
+        return []
+    indexes = calendar_indexes([slots[entry.times_id] for entry in waiting])
+    promoted = []
+    for times_id, entries in groupby(waiting, key=lambda entry: entry.times_id):
+        slot = slots[times_id]
+        index = indexes.setdefault(slot.resource_id, IntervalIndex())
+        start, end = slot_interval(slot)
+        capacity = capacities.get(slot.resource_id, SHARED_CAPACITY)
+        for entry in entries:
+            if not index.fits(start, end, capacity):
+                break
+            deleted, _ = WaitlistEntry.objects.filter(pk=entry.pk).delete()
+            if not deleted:
+                continue # left the waitlist meanwhile
+            if Appointment.objects.filter(times=slot, client_id=entry.client_id).exists():
+                continue # booked it themselves meanwhile
+            promoted.append(Appointment.objects.create(times=slot, client=entry.client))
+            index.add(start, end)
+            queue_mail('Waitlist Appointment',
+                       f"Hello {entry.client.username} a place opened up and you have been booked an appointment on {slot.date_start} at {slot.time_start}",
+                       'from@example.com',
+                       [f'{entry.client.email}'])
+    return promoted
+
+
+def waitlist_position(entry):
+    """
+    How many clients are ahead of `entry` on its slot's waitlist, plus one.
+    """
+    ahead = (Q(priority__gt=entry.priority)
+             | Q(priority=entry.priority, created__lt=entry.created)
+             | Q(priority=entry.priority, created=entry.created, id__lt=entry.id))
+    return WaitlistEntry.objects.filter(ahead, times_id=entry.times_id).count() + 1
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from appointments.database import database_from_env, replicas_from_env, sqlite_pragmas_from_env
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_DIR = True
@@ -38,15 +40,17 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'appointment_app',
+    'appointment_app.apps.AppointmentAppConfig',
 ]
 
 MIDDLEWARE = [
+    'appointment_app.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'appointment_app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,17 +75,103 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'appointments.wsgi.application'
 
+# skips the benchmark tests unless run with --tag benchmark
+TEST_RUNNER = 'appointments.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Set DATABASE_URL, DATABASE_CONN_MAX_AGE, DATABASE_POOLER and SQLITE_PROFILE in the environment,
+# see appointments/database.py. Without them this is db.sqlite3 next to manage.py as before.
+# benchmarks/database_profiles.py compares concurrent booking throughput of the profiles.
+
 DATABASES = {
+    'default': database_from_env(os.environ, BASE_DIR),
+    **replicas_from_env(os.environ, BASE_DIR),
+}
+
+# GET, HEAD and OPTIONS requests read the appointment tables from a replica, see appointment_app/routers.py.
+# A client that wrote reads from the primary for APPOINTMENT_REPLICA_PIN_SECONDS, which should be
+# longer than the replicas ever lag behind.
+DATABASE_ROUTERS = ['appointment_app.routers.ReplicaRouter']
+APPOINTMENT_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+APPOINTMENT_REPLICA_PIN_SECONDS = 5
+
+# PRAGMAs run on each new SQLite connection, WAL etc. with SQLITE_PROFILE=production.
+APPOINTMENT_SQLITE_PRAGMAS = sqlite_pragmas_from_env(os.environ)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Any cache backend works here (memcached, redis, database), the appointment responses are cached
+# under APPOINTMENT_CACHE_ALIAS for APPOINTMENT_CACHE_TIMEOUT seconds.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'appointments',
     }
 }
 
+APPOINTMENT_CACHE_ALIAS = 'default'
+APPOINTMENT_CACHE_TIMEOUT = 300
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'EXCEPTION_HANDLER': 'appointment_app.exceptions.exception_handler',
+    # Session first so requests without credentials still get a 403, token clients send no cookie
+    # and so skip the session lookup. Basic auth hashes the password on every request. A failed
+    # Bearer token gets a 401 with a challenge all the same, see appointment_app.exceptions.
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'appointment_app.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'appointment_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'appointment_app.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Build list pages from .values() rows and encode/decode JSON with orjson (if installed).
+# The output is byte for byte the same as the stock path, see benchmarks/rendering.py.
+APPOINTMENT_FAST_JSON = False
+
+# Fraction of requests (0 to 1) that RequestTimingMiddleware times, sampled responses get a
+# Server-Timing header and a JSON line on the appointment_app.timing logger. 0 turns it off.
+APPOINTMENT_TIMING_SAMPLE_RATE = 0.0
+
+# Slot taken/freed events for /availability/stream/ (ASGI only) are fanned out by this broker.
+# InProcessBroker only reaches the streams served by the same process.
+APPOINTMENT_BROKER = 'appointment_app.broker.InProcessBroker'
+APPOINTMENT_SSE_HEARTBEAT = 15 # seconds between keep-alive comments
+APPOINTMENT_SSE_MAX_SECONDS = 300 # streams are closed after this long and the client reconnects
+
+# How long /appointments/changes/ keeps the ids of deleted rows, see: python manage.py prune_tombstones.
+# A client that hasn't synced for longer has to start again from scratch.
+APPOINTMENT_TOMBSTONE_DAYS = 30
+
+# Slots that ended more than this many days ago are moved to the archive with their appointments,
+# see: python manage.py archive_past. The lists and the export show them with ?archived=true.
+APPOINTMENT_ARCHIVE_DAYS = 7
+
+
+# Signed tokens from /auth/token/ (see appointment_app.authentication). Access tokens are checked
+# without the database, so a deactivated user keeps access until theirs expires. Revoked token ids
+# are reloaded from the database this often, revocations in another process take up to that long.
+APPOINTMENT_ACCESS_TOKEN_SECONDS = 300
+APPOINTMENT_REFRESH_TOKEN_SECONDS = 14 * 24 * 3600
+APPOINTMENT_REVOCATION_CACHE_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -122,6 +212,7 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' # This means we get an email printed out in the console
+# Emails are queued in the OutboxMessage table by the views and sent with: python manage.py send_outbox --loop
 
 '''
 LOGGING = {
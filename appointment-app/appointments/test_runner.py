@@ -0,0 +1,18 @@
+"""
+The test runner: Django's, except that the tests tagged BENCHMARK_TAG, which run the benchmarks in
+subprocesses and take a good part of the suite's time, are left out unless asked for.
+
+    python manage.py test                   everything else
+    python manage.py test --tag benchmark   only the benchmarks
+"""
+from django.test.runner import DiscoverRunner
+
+BENCHMARK_TAG = 'benchmark'
+
+
+class TestRunner(DiscoverRunner):
+
+    def __init__(self, *args, tags=None, exclude_tags=None, **kwargs):
+        if BENCHMARK_TAG not in (tags or ()):
+            exclude_tags = {*(exclude_tags or ()), BENCHMARK_TAG}
+        super().__init__(*args, tags=tags, exclude_tags=exclude_tags, **kwargs)
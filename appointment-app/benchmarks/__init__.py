@@ -0,0 +1,9 @@
+"""
+Benchmarks and load harnesses for the appointments API.
+
+Run them from the appointment-app directory, e.g.
+
+    python -m benchmarks.booking_contention --bookers 8 --slots 4
+
+Each benchmark runs against a throwaway database so it never touches db.sqlite3.
+"""
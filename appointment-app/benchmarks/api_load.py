@@ -0,0 +1,360 @@
+"""
+Load test for GET /appointments/ and GET /appointments/<pk>/.
+
+Seeds users, slots and appointments with the bulk factories, then drives the WSGI application with
+concurrent clients, either in process (the WSGI callable is called directly, no sockets) or over a
+local threaded HTTP server, and reports throughput, latency percentiles, queries per request and
+peak memory per endpoint. Save the JSON and pass it back with --compare to spot regressions.
+
+    python -m benchmarks.api_load --users 100 --times 5000 --appointments 4000 --output before.json
+    python -m benchmarks.api_load --users 100 --times 5000 --appointments 4000 --compare before.json
+"""
+import argparse
+import collections
+import datetime
+import http.client
+import io
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks.env import setup_django, temporary_database
+
+DRIVERS = ('in_process', 'server')
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def session_headers(user):
+    """
+    Request headers with a session cookie for `user`, so requests skip the password hash that basic
+    auth would do each time.
+    """
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    return {'Cookie': f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'}
+
+
+class QueryCountingApp:
+    """
+    Wraps a WSGI application and counts the queries each request runs, from whatever thread serves it.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.queries = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        from django.db import connection
+
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            response = self.application(environ, start_response)
+        with self.lock:
+            self.queries += count
+            self.requests += 1
+        return response
+
+    def reset(self):
+        with self.lock:
+            self.queries = self.requests = 0
+
+
+class InProcessDriver:
+    """
+    Calls the WSGI application directly, measuring Django and the app without any network overhead.
+
+    Both drivers send Host: testserver, the host setup_test_environment() adds to ALLOWED_HOSTS.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def session(self):
+        return self
+
+    def close(self):
+        pass
+
+    def get(self, path, headers):
+        path, _, query = path.partition('?')
+        environ = {}
+        setup_testing_defaults(environ)
+        environ.update({'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'testserver', 'PATH_INFO': path, 'QUERY_STRING': query,
+                        'HTTP_ACCEPT': 'application/json', 'wsgi.input': io.BytesIO()})
+        environ.update({'HTTP_' + name.upper().replace('-', '_'): value for name, value in headers.items()})
+        statuses = []
+        response = self.application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            body = b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return int(statuses[0].split()[0]), body
+
+
+class ServerDriver:
+    """
+    Serves the WSGI application from Django's threaded development server on a free local port and
+    talks to it over keep-alive HTTP connections, one per client.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.server = self.thread = None
+
+    def start(self):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            disable_nagle_algorithm = True # headers and body go out in separate writes
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        self.server.set_app(self.application)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def session(self):
+        return ServerSession(self.server.server_address[1])
+
+
+class ServerSession:
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def get(self, path, headers):
+        self.connection.request('GET', path, headers={'Host': 'testserver', 'Accept': 'application/json', **headers})
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def close(self):
+        self.connection.close()
+
+
+def drive(driver, paths, headers, clients, requests):
+    """
+    Send `requests` GETs spread over `clients` concurrent clients, each cycling through `paths`,
+    sending `headers` (e.g. session_headers()) with each, and return ([(status, seconds), ...], elapsed seconds).
+    """
+    from django.db import connection
+
+    barrier = threading.Barrier(clients)
+    results = []
+    lock = threading.Lock()
+
+    def client(number):
+        session = driver.session()
+        share = requests // clients + (number < requests % clients)
+        outcome = []
+        barrier.wait()
+        try:
+            for path in itertools.islice(itertools.cycle(paths[number::clients] or paths), share):
+                started = time.perf_counter()
+                status_code, _ = session.get(path, headers)
+                outcome.append((status_code, time.perf_counter() - started))
+        finally:
+            session.close()
+            connection.close()
+        with lock:
+            results.extend(outcome)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def peak_memory(driver, paths, headers, samples=20):
+    """
+    Largest peak of Python allocations made while serving one request, over up to `samples` requests
+    sent one at a time. Traced separately from the timed run because tracemalloc slows everything down.
+    """
+    session = driver.session()
+    tracemalloc.start()
+    peak = 0
+    try:
+        for path in paths[:samples]:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            session.get(path, headers)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+        session.close()
+    return peak
+
+
+def summarise(results, elapsed, queries=None, peak=None):
+    statuses = collections.Counter(status_code for status_code, _ in results)
+    latencies = sorted(seconds for _, seconds in results)
+    summary = {
+        'requests': len(results),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': sum(count for code, count in statuses.items() if code >= 400),
+        'seconds': round(elapsed, 4),
+        'requests_per_second': round(len(results) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+    if queries is not None:
+        summary['queries_per_request'] = round(queries, 2)
+    if peak is not None:
+        summary['peak_memory_kb'] = round(peak / 1024, 1)
+    return summary
+
+
+def endpoint_paths(appointment_ids, page_size):
+    return {
+        'list': [f'/appointments/?page_size={page_size}'],
+        'detail': [f'/appointments/{pk}/' for pk in appointment_ids],
+    }
+
+
+def run(users=50, times=2000, appointments=1500, clients=8, requests=400, page_size=50, drivers=DRIVERS, cache=True):
+    """
+    Seed the current database and load test each endpoint with each driver, returning a results dict.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import override_settings
+    from appointment_app.models import Appointment
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    seeded_users = seed_users(users)
+    seed_appointments(seeded_users, seed_times(times), appointments)
+    headers = session_headers(seeded_users[0])
+    appointment_ids = list(Appointment.objects.order_by('id').values_list('id', flat=True))
+    paths = endpoint_paths(appointment_ids, page_size)
+
+    caches = None if cache else {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    application = QueryCountingApp(WSGIHandler())
+    results = {}
+    with override_settings(**({'CACHES': caches} if caches else {})):
+        for name in drivers:
+            driver = {'in_process': InProcessDriver, 'server': ServerDriver}[name](application)
+            driver.start()
+            try:
+                results[name] = {}
+                for endpoint, endpoint_path_list in paths.items():
+                    drive(driver, endpoint_path_list, headers, clients, min(requests, max(len(endpoint_path_list), clients))) # warm up
+                    application.reset()
+                    timed, elapsed = drive(driver, endpoint_path_list, headers, clients, requests)
+                    queries = application.queries / application.requests if application.requests else 0
+                    peak = peak_memory(driver, endpoint_path_list, headers)
+                    results[name][endpoint] = summarise(timed, elapsed, queries, peak)
+            finally:
+                driver.stop()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    """
+    Ratio of current to baseline throughput and p99 latency for every driver and endpoint in both runs.
+    A requests_per_second ratio below 1 or a p99_ms ratio above 1 is a regression.
+    """
+    comparison = {}
+    for driver, endpoints in current['results'].items():
+        for endpoint, summary in endpoints.items():
+            before = baseline.get('results', {}).get(driver, {}).get(endpoint)
+            if not before:
+                continue
+            comparison[f'{driver}.{endpoint}'] = {
+                metric: round(summary[metric] / before[metric], 2) if before.get(metric) else None
+                for metric in ('requests_per_second', 'p99_ms', 'queries_per_request', 'peak_memory_kb')
+            }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--times', type=int, default=2000)
+    parser.add_argument('--appointments', type=int, default=1500)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients.')
+    parser.add_argument('--requests', type=int, default=400, help='Timed requests per endpoint and driver.')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--driver', choices=DRIVERS, action='append', help='Repeat to run several, default all.')
+    parser.add_argument('--no-cache', action='store_true', help='Swap the response cache for a dummy one.')
+    parser.add_argument('--output', help='Also write the results JSON to this file.')
+    parser.add_argument('--compare', help='Results JSON from an earlier run to compare against.')
+    args = parser.parse_args()
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    from django.conf import settings
+
+    with temporary_database():
+        results = run(args.users, args.times, args.appointments, args.clients, args.requests, args.page_size,
+                      args.driver or DRIVERS, not args.no_cache)
+    report = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+        'parameters': {'users': args.users, 'times': args.times, 'appointments': args.appointments,
+                       'clients': args.clients, 'requests': args.requests, 'page_size': args.page_size,
+                       'cache': not args.no_cache, 'fast_json': settings.APPOINTMENT_FAST_JSON},
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare) as baseline:
+            report['comparison'] = compare(json.load(baseline), report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as results_file:
+            results_file.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
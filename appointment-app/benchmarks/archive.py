@@ -0,0 +1,78 @@
+"""
+Hot table size and transaction length when past slots are archived in chunks.
+
+Books every slot of --past-days days that are over and --future-days days to come, then moves
+the past ones to the archive with archive_chunks() and reports the table sizes before and after,
+how long the whole move and the longest single transaction took, and whether every past
+appointment arrived in the archive while the future ones stayed put.
+
+    python -m benchmarks.archive --past-days 3650 --future-days 90 --chunk-size 1000
+"""
+import argparse
+import datetime
+import json
+import time
+
+from benchmarks.env import setup_django, temporary_database
+
+FIRST_DATE = datetime.date(2030, 1, 1)
+
+
+def table_sizes():
+    from appointment_app.models import Appointment, ArchivedAppointment, Times
+
+    return {'times': Times.objects.count(), 'appointments': Appointment.objects.count(),
+            'archived': ArchivedAppointment.objects.count()}
+
+
+def run(past_days=3650, future_days=90, chunk_size=1000, clients=100):
+    from django.utils import timezone
+    from appointment_app.archive import archive_chunks
+    from appointment_app.models import CHOICES_TIME_START, Appointment
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    users = seed_users(clients)
+    slots = seed_times(len(CHOICES_TIME_START) * (past_days + future_days), first_date=FIRST_DATE)
+    seed_appointments(users, slots, len(slots))
+    cutoff = FIRST_DATE + datetime.timedelta(days=past_days)
+    future = set(Appointment.objects.filter(times__date_start__gte=cutoff).values_list('id', flat=True))
+    before = table_sizes()
+
+    chunks = []
+    started = time.perf_counter()
+    chunk_started = started
+    for _ in archive_chunks(timezone.make_aware(datetime.datetime.combine(cutoff, datetime.time())), chunk_size):
+        now = time.perf_counter()
+        chunks.append(now - chunk_started)
+        chunk_started = now
+    elapsed = time.perf_counter() - started
+    after = table_sizes()
+
+    return {
+        'before': before,
+        'after': after,
+        'chunks': len(chunks),
+        'archive_ms': round(elapsed * 1000, 2),
+        'longest_transaction_ms': round(max(chunks, default=0) * 1000, 2),
+        'appointments_per_second': round(after['archived'] / elapsed) if elapsed else None,
+        'future_kept': set(Appointment.objects.values_list('id', flat=True)) == future,
+        'past_archived': after['archived'] == before['appointments'] - len(future),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--past-days', type=int, default=3650)
+    parser.add_argument('--future-days', type=int, default=90, help='The booking window that stays in the hot tables.')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Slots moved per transaction.')
+    parser.add_argument('--clients', type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        results = run(args.past_days, args.future_days, args.chunk_size, args.clients)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
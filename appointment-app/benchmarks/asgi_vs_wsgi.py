@@ -0,0 +1,116 @@
+"""
+Throughput of the sync views under WSGI versus the async views under ASGI, at several numbers of
+concurrent keep-alive connections.
+
+WSGI is Django's threaded WSGI server with /appointments/..., ASGI is uvicorn (pip install uvicorn)
+with /async/appointments/..., both in this process against the same seeded database.
+
+    python -m benchmarks.asgi_vs_wsgi --connections 1 8 32 --requests 800
+"""
+import argparse
+import json
+import logging
+import socket
+import threading
+import time
+
+from benchmarks.api_load import ServerDriver, ServerSession, drive, session_headers, summarise
+from benchmarks.env import setup_django, temporary_database
+
+try:
+    import uvicorn
+except ImportError: # optional, only the ASGI half of this benchmark needs it
+    uvicorn = None
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+class UvicornDriver:
+    """
+    Serves the ASGI application from uvicorn in a background thread, same interface as ServerDriver.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.server = self.thread = self.port = None
+
+    def start(self):
+        self.port = free_port()
+        config = uvicorn.Config(self.application, host='127.0.0.1', port=self.port, lifespan='off',
+                                log_level='warning', access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+    def session(self):
+        return ServerSession(self.port)
+
+
+def run(users=20, times=1000, appointments=800, connections=(1, 8, 32), requests=400, cache=True):
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import override_settings
+    from appointment_app.models import Appointment
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    seeded_users = seed_users(users)
+    seed_appointments(seeded_users, seed_times(times), appointments)
+    headers = session_headers(seeded_users[0])
+    appointment_ids = list(Appointment.objects.order_by('id').values_list('id', flat=True))
+
+    servers = {'wsgi': (ServerDriver(WSGIHandler()), ''), 'asgi': (UvicornDriver(ASGIHandler()), '/async')}
+    caches = None if cache else {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    results = {}
+    with override_settings(**({'CACHES': caches} if caches else {})):
+        for name, (driver, prefix) in servers.items():
+            endpoints = {'list': [f'{prefix}/appointments/'],
+                         'detail': [f'{prefix}/appointments/{pk}/' for pk in appointment_ids]}
+            driver.start()
+            try:
+                results[name] = {}
+                for endpoint, paths in endpoints.items():
+                    for clients in connections:
+                        drive(driver, paths, headers, clients, max(clients, min(requests, len(paths)))) # warm up
+                        timed, elapsed = drive(driver, paths, headers, clients, requests)
+                        results[name].setdefault(endpoint, {})[str(clients)] = summarise(timed, elapsed)
+            finally:
+                driver.stop()
+    results['asgi_over_wsgi'] = {
+        endpoint: {clients: round(summary['requests_per_second'] / results['wsgi'][endpoint][clients]['requests_per_second'], 2)
+                   for clients, summary in by_clients.items()}
+        for endpoint, by_clients in results['asgi'].items()
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--times', type=int, default=1000)
+    parser.add_argument('--appointments', type=int, default=800)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 8, 32], help='Concurrent connections to try.')
+    parser.add_argument('--requests', type=int, default=400, help='Timed requests per endpoint, server and connection count.')
+    parser.add_argument('--no-cache', action='store_true', help='Swap the response cache for a dummy one.')
+    args = parser.parse_args()
+    if uvicorn is None:
+        parser.error('the ASGI server needs uvicorn: pip install uvicorn')
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    with temporary_database():
+        results = run(args.users, args.times, args.appointments, args.connections, args.requests, not args.no_cache)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Cost of authenticating an API request with basic auth, a session cookie and a signed bearer token.
+
+Measures each scheme twice: the authentication step on its own (the session and auth middleware
+plus the DRF authenticators, as configured) in microseconds with the queries it runs, and whole
+GET /appointments/<pk>/ requests through the WSGI application with api_load's in-process driver.
+Basic auth hashes the password on every request, so it gets fewer iterations.
+
+    python -m benchmarks.auth --repeat 2000 --requests 400
+"""
+import argparse
+import base64
+import json
+import logging
+import time
+
+from benchmarks.api_load import InProcessDriver, QueryCountingApp, drive, percentile, session_headers, summarise
+from benchmarks.env import setup_django, temporary_database
+
+SCHEMES = ('basic', 'session', 'token')
+PASSWORD = 'bench_pass' # what benchmarks.factories.seed_users sets
+
+
+def scheme_headers(user):
+    from appointment_app.authentication import ACCESS, issue_token
+
+    credentials = base64.b64encode(f'{user.username}:{PASSWORD}'.encode()).decode()
+    return {
+        'basic': {'Authorization': f'Basic {credentials}'},
+        'session': session_headers(user),
+        'token': {'Authorization': f'Bearer {issue_token(user, ACCESS)}'},
+    }
+
+
+def authenticate_once(factory, headers):
+    """
+    Run what a request goes through to get its user, return (seconds, queries).
+    """
+    from django.contrib.auth.middleware import AuthenticationMiddleware
+    from django.contrib.sessions.middleware import SessionMiddleware
+    from django.db import connection
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    request = factory.get('/appointments/', **{'HTTP_' + name.upper().replace('-', '_'): value for name, value in headers.items()})
+    queries = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        SessionMiddleware(lambda request: None).process_request(request)
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        user = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+        elapsed = time.perf_counter() - started
+    if not user.is_authenticated:
+        raise RuntimeError(f'{headers} did not authenticate')
+    return elapsed, queries
+
+
+def authenticate_timings(headers, repeat):
+    from django.test import RequestFactory
+
+    factory = RequestFactory()
+    authenticate_once(factory, headers) # warm up
+    runs = [authenticate_once(factory, headers) for _ in range(repeat)]
+    seconds = sorted(elapsed for elapsed, _ in runs)
+    return {
+        'repeat': repeat,
+        'mean_us': round(sum(seconds) / len(seconds) * 1e6, 1),
+        'p50_us': round(percentile(seconds, 0.50) * 1e6, 1),
+        'p99_us': round(percentile(seconds, 0.99) * 1e6, 1),
+        'queries': round(sum(queries for _, queries in runs) / len(runs), 2),
+    }
+
+
+def run(users=10, times=200, appointments=100, clients=4, requests=400, repeat=2000, basic_repeat=10, basic_requests=40):
+    from django.core.handlers.wsgi import WSGIHandler
+    from appointment_app.models import Appointment
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    seeded_users = seed_users(users)
+    seed_appointments(seeded_users, seed_times(times), appointments)
+    headers = scheme_headers(seeded_users[0])
+    paths = [f'/appointments/{pk}/' for pk in Appointment.objects.order_by('id').values_list('id', flat=True)]
+
+    application = QueryCountingApp(WSGIHandler())
+    driver = InProcessDriver(application)
+    results = {'authenticate': {}, 'request': {}}
+    for scheme in SCHEMES:
+        results['authenticate'][scheme] = authenticate_timings(headers[scheme], basic_repeat if scheme == 'basic' else repeat)
+        count = basic_requests if scheme == 'basic' else requests
+        drive(driver, paths, headers[scheme], clients, min(count, len(paths))) # warm up, fills the response cache
+        application.reset()
+        timed, elapsed = drive(driver, paths, headers[scheme], clients, count)
+        results['request'][scheme] = summarise(timed, elapsed, application.queries / application.requests)
+    results['token_speedup'] = {
+        scheme: round(results['authenticate'][scheme]['mean_us'] / results['authenticate']['token']['mean_us'], 1)
+        for scheme in SCHEMES if scheme != 'token'
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--times', type=int, default=200)
+    parser.add_argument('--appointments', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients for the request runs.')
+    parser.add_argument('--requests', type=int, default=400, help='Timed requests per scheme.')
+    parser.add_argument('--repeat', type=int, default=2000, help='Timed authentications per scheme.')
+    parser.add_argument('--basic-repeat', type=int, default=10, help='Timed authentications for basic auth.')
+    parser.add_argument('--basic-requests', type=int, default=40, help='Timed requests for basic auth.')
+    args = parser.parse_args()
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    with temporary_database():
+        results = run(args.users, args.times, args.appointments, args.clients, args.requests, args.repeat,
+                      args.basic_repeat, args.basic_requests)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
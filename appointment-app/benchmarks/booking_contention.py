@@ -0,0 +1,182 @@
+"""
+Contention harness for POST /appointments/.
+
+N bookers hammer a small pool of slots at the same time, from threads or forked processes, and the
+harness checks that every slot ends up booked exactly once, that losers get a clean 409 rather
+than a 500, and reports how many requests per second got through. With --readers, that many
+clients poll GET /appointments/changes/ (never cached) meanwhile, so readers and writers contend.
+
+    python -m benchmarks.booking_contention --bookers 8 --slots 4 --attempts 10 --mode process
+    python -m benchmarks.booking_contention --bookers 8 --slots 500 --readers 8 --mode process
+"""
+import argparse
+import collections
+import datetime
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+
+from benchmarks.env import setup_django, temporary_database
+
+
+def create_bookers_and_slots(bookers, slots, first_date=datetime.date(2030, 1, 1)):
+    from django.contrib.auth import get_user_model
+    from appointment_app.models import Times
+
+    User = get_user_model()
+    User.objects.bulk_create([User(username=f'booker{number}', email=f'booker{number}@example.com')
+                              for number in range(bookers)])
+    times = []
+    for number in range(slots):
+        time_slot = Times(time_start=datetime.time(9), date_start=first_date + datetime.timedelta(days=number))
+        time_slot.save()
+        times.append(time_slot.id)
+    return list(User.objects.filter(username__startswith='booker').order_by('id').values_list('id', flat=True)), times
+
+
+def book(user_id, times_ids, attempts, barrier, seed):
+    """
+    Try to book `attempts` random slots as one user and return [(status_code, seconds), ...].
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient(raise_request_exception=False) # a server error is a result, not a crash
+    client.force_authenticate(user=get_user_model().objects.get(id=user_id))
+    chooser = random.Random(seed)
+    results = []
+    barrier.wait()
+    try:
+        for _ in range(attempts):
+            times_id = chooser.choice(times_ids)
+            started = time.perf_counter()
+            response = client.post('/appointments/', {'times': {'id': times_id, 'time_start': '09:00:00', 'date_start': '2030-01-01'}}, format='json')
+            results.append((response.status_code, time.perf_counter() - started))
+    finally:
+        connection.close()
+    return results
+
+
+def read(user_id, times_ids, attempts, barrier, seed):
+    """
+    Ask for `attempts` pages of changes as one user and return [(status_code, seconds), ...].
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user=get_user_model().objects.get(id=user_id))
+    results = []
+    barrier.wait()
+    try:
+        for _ in range(attempts):
+            started = time.perf_counter()
+            response = client.get('/appointments/changes/', {'limit': 50})
+            results.append((response.status_code, time.perf_counter() - started))
+    finally:
+        connection.close()
+    return results
+
+
+def _run_in_process(queue, kind, function, *args):
+    queue.put((kind, function(*args)))
+
+
+def summarise(results, elapsed):
+    statuses = collections.Counter(status_code for status_code, _ in results)
+    latencies = sorted(seconds for _, seconds in results)
+    return {
+        'requests': len(results),
+        'statuses': dict(sorted(statuses.items())),
+        'seconds': round(elapsed, 4),
+        'requests_per_second': round(len(results) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def run_contention(bookers=8, slots=4, attempts=5, mode='thread', readers=0):
+    """
+    Run the contention scenario against the current database and return a summary dict.
+
+    The caller is responsible for pointing Django at a database that can be written to.
+    """
+    from django.db import connection
+    from appointment_app.models import Appointment
+
+    user_ids, times_ids = create_bookers_and_slots(bookers, slots)
+    workers = ([('book', book, user_id, seed) for seed, user_id in enumerate(user_ids)]
+               + [('read', read, user_ids[number % bookers], number) for number in range(readers)])
+    results = {'book': [], 'read': []}
+    started = time.perf_counter()
+    if mode == 'thread':
+        barrier = threading.Barrier(len(workers))
+        lock = threading.Lock()
+
+        def worker(kind, function, user_id, seed):
+            outcome = function(user_id, times_ids, attempts, barrier, seed)
+            with lock:
+                results[kind].extend(outcome)
+
+        threads = [threading.Thread(target=worker, args=arguments) for arguments in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elif mode == 'process':
+        connection.close() # children must open their own connections
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(len(workers))
+        queue = context.Queue()
+        processes = [context.Process(target=_run_in_process, args=(queue, kind, function, user_id, times_ids, attempts, barrier, seed))
+                     for kind, function, user_id, seed in workers]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            kind, outcome = queue.get()
+            results[kind].extend(outcome)
+        for process in processes:
+            process.join()
+    else:
+        raise ValueError(f'Unknown mode {mode!r}, use thread or process.')
+    elapsed = time.perf_counter() - started
+
+    summary = summarise(results['book'], elapsed)
+    booked_slots = Appointment.objects.filter(times_id__in=times_ids).count()
+    summary = {
+        'mode': mode,
+        'bookers': bookers,
+        'slots': slots,
+        **summary,
+        'booked_slots': booked_slots,
+        'correct': summary['statuses'].get(201, 0) == booked_slots and not any(code >= 500 for code in summary['statuses']),
+    }
+    if readers:
+        summary['reads'] = summarise(results['read'], elapsed)
+        summary['correct'] = summary['correct'] and not any(code >= 500 for code in summary['reads']['statuses'])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bookers', type=int, default=8)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--attempts', type=int, default=5, help='Booking attempts per booker.')
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--readers', type=int, default=0, help='Clients reading /appointments/changes/ meanwhile, as many times each.')
+    args = parser.parse_args()
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.ERROR) # every lost race logs a 409 warning
+    with temporary_database():
+        summary = run_contention(args.bookers, args.slots, args.attempts, args.mode, args.readers)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
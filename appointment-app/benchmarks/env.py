@@ -0,0 +1,40 @@
+import contextlib
+import os
+import tempfile
+
+
+def setup_django():
+    """
+    Configure Django for a standalone benchmark script.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appointments.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """
+    Point the default connection at a fresh, migrated test database for the duration of the block.
+
+    On SQLite a file (rather than the in-memory test database) is used so that threads and forked
+    processes share one database and contend on its locks the way real workers do.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    path = None
+    if connection.vendor == 'sqlite':
+        handle, path = tempfile.mkstemp(suffix='.sqlite3', prefix='appointments-bench-')
+        os.close(handle)
+        connection.settings_dict['TEST']['NAME'] = path
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield path
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        for leftover in ([path, path + '-wal', path + '-shm'] if path else []): # WAL mode adds the last two
+            if os.path.exists(leftover):
+                os.remove(leftover)
@@ -0,0 +1,43 @@
+"""
+Bulk factories for seeding benchmark databases.
+"""
+import datetime
+import itertools
+
+
+def seed_users(count, prefix='client'):
+    """
+    Create `count` users with one bulk INSERT. They share a single password hash so seeding
+    doesn't spend minutes in PBKDF2; the password is 'bench_pass'.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    User = get_user_model()
+    password = make_password('bench_pass')
+    User.objects.bulk_create([User(username=f'{prefix}{number}', email=f'{prefix}{number}@example.com', password=password)
+                              for number in range(count)], batch_size=500)
+    return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+
+def seed_times(count, first_date=datetime.date(2030, 1, 1)):
+    """
+    Create at least `count` Times, every offered start time on consecutive days, with bulk INSERTs.
+    """
+    from appointment_app.models import CHOICES_TIME_START, Times
+    from appointment_app.slots import generate_slots
+
+    days = -(-count // len(CHOICES_TIME_START))
+    generate_slots(first_date, first_date + datetime.timedelta(days=days - 1))
+    return list(Times.objects.filter(date_start__gte=first_date).order_by('date_start', 'time_start')[:count])
+
+
+def seed_appointments(users, times, count):
+    """
+    Book the first `count` of `times`, handing them out to `users` round robin.
+    """
+    from appointment_app.models import Appointment
+
+    Appointment.objects.bulk_create([Appointment(times=time, client=user)
+                                     for time, user in zip(times[:count], itertools.cycle(users))], batch_size=500)
+    return Appointment.objects.count()
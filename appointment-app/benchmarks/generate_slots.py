@@ -0,0 +1,54 @@
+"""
+Rows/sec for creating Times one save() at a time versus generate_slots' bulk INSERTs.
+
+    python -m benchmarks.generate_slots --days 365
+"""
+import argparse
+import datetime
+import json
+import time
+
+from benchmarks.env import setup_django, temporary_database
+
+
+def per_row_save(date_from, date_to):
+    from appointment_app.models import Times
+    from appointment_app.slots import build_slots
+
+    for slot in build_slots(date_from, date_to):
+        Times(time_start=slot.time_start, date_start=slot.date_start).save()
+
+
+def run(days=365, batch_size=500):
+    from appointment_app.models import Times
+    from appointment_app.slots import generate_slots
+
+    date_from = datetime.date(2030, 1, 1)
+    date_to = date_from + datetime.timedelta(days=days - 1)
+    results = {}
+    for name, create in (('per_row_save', lambda: per_row_save(date_from, date_to)),
+                         ('bulk_create', lambda: generate_slots(date_from, date_to, batch_size=batch_size))):
+        Times.objects.all().delete()
+        started = time.perf_counter()
+        create()
+        elapsed = time.perf_counter() - started
+        rows = Times.objects.count()
+        results[name] = {'rows': rows, 'seconds': round(elapsed, 4), 'rows_per_second': round(rows / elapsed, 1)}
+    results['speedup'] = round(results['bulk_create']['rows_per_second'] / results['per_row_save']['rows_per_second'], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        results = run(args.days, args.batch_size)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Overlap checks against a dense calendar: IntervalIndex versus comparing every pair.
+
+Books --bookings variable-length appointments (15 to 120 minutes, on a 5 minute grid) onto one
+resource over --days days, then asks for --checks candidate slots how many bookings overlap them at
+the busiest moment, once by scanning every booking and once with the index. Both must agree.
+
+    python -m benchmarks.interval_index --bookings 5000 --checks 5000
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks.env import setup_django
+
+FIRST_DAY = datetime.datetime(2030, 1, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+def random_intervals(count, days, chooser):
+    intervals = []
+    for _ in range(count):
+        start = FIRST_DAY + datetime.timedelta(days=chooser.randrange(days), minutes=5 * chooser.randrange(120))
+        intervals.append((start, start + datetime.timedelta(minutes=chooser.choice((15, 30, 45, 60, 90, 120)))))
+    return intervals
+
+
+def pairwise_depth(bookings, start, end):
+    events = []
+    for begin, finish in bookings:
+        if begin < end and finish > start:
+            events.append((max(begin, start), 1))
+            events.append((finish, -1))
+    current = deepest = 0
+    for _, change in sorted(events):
+        current += change
+        deepest = max(deepest, current)
+    return deepest
+
+
+def run(bookings=5000, checks=5000, days=30, seed=1):
+    from appointment_app.capacity import IntervalIndex
+
+    chooser = random.Random(seed)
+    booked = random_intervals(bookings, days, chooser)
+    candidates = random_intervals(checks, days, chooser)
+
+    started = time.perf_counter()
+    pairwise = [pairwise_depth(booked, start, end) for start, end in candidates]
+    pairwise_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = IntervalIndex(booked)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    indexed = [index.depth(start, end) for start, end in candidates]
+    index_seconds = time.perf_counter() - started
+
+    return {
+        'bookings': bookings,
+        'checks': checks,
+        'pairwise_ms': round(pairwise_seconds * 1000, 2),
+        'index_build_ms': round(build_seconds * 1000, 2),
+        'index_ms': round(index_seconds * 1000, 2),
+        'speedup': round(pairwise_seconds / (build_seconds + index_seconds), 1),
+        'busiest': max(indexed, default=0),
+        'same_answers': pairwise == indexed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--checks', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    print(json.dumps(run(args.bookings, args.checks, args.days, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Reminder emails: send_reminders versus send_mail per appointment from a loop.
+
+Books --appointments appointments on the slots of the next day, then times send_reminders()
+sending all of them in chunks over one connection, and the naive loop (a query per appointment
+for its client and one send_mail, so one connection, per email) over the first --naive of them.
+Emails go to the in-memory backend, which counts the connections opened; a second
+send_reminders() run must send nothing.
+
+    python -m benchmarks.reminders --appointments 100000
+"""
+import argparse
+import datetime
+import json
+import time
+
+from django.core.mail.backends.locmem import EmailBackend
+
+from benchmarks.env import setup_django, temporary_database
+
+NOW = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class CountingBackend(EmailBackend):
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        type(self).connections += 1
+
+
+def naive_reminders(count):
+    from django.core.mail import send_mail
+    from appointment_app.models import Appointment
+
+    for appointment in Appointment.objects.select_related('times').order_by('times__time_end', 'id')[:count]:
+        send_mail('Appointment Reminder',
+                  f"Hello {appointment.client.username} this is a reminder of your appointment on {appointment.times.date_start} at {appointment.times.time_start}",
+                  'from@example.com',
+                  [f'{appointment.client.email}'])
+
+
+def measure(function, *args, **kwargs):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    CountingBackend.connections = 0
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+    return result, elapsed, len(queries), CountingBackend.connections
+
+
+def run(appointments=100000, naive=2000, chunk_size=500, clients=1000):
+    from django.core import mail
+    from django.test.utils import override_settings
+    from appointment_app.reminders import send_reminders
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    users = seed_users(clients)
+    slots = seed_times(3, first_date=NOW.date()) # 09:00, 11:00 and 15:00, all due
+    seed_appointments(users, [slots[number % len(slots)] for number in range(appointments)], appointments)
+    naive = min(naive, appointments)
+
+    with override_settings(EMAIL_BACKEND=f'{__name__}.CountingBackend'):
+        mail.outbox = []
+        _, naive_seconds, naive_queries, naive_connections = measure(naive_reminders, naive)
+        mail.outbox = []
+        sent, batched_seconds, batched_queries, batched_connections = measure(send_reminders, chunk_size=chunk_size, now=NOW)
+        emails = len(mail.outbox)
+        again, _, _, _ = measure(send_reminders, chunk_size=chunk_size, now=NOW)
+
+    return {
+        'appointments': appointments,
+        'naive': {'reminders': naive, 'ms': round(naive_seconds * 1000, 2), 'queries': naive_queries,
+                  'connections': naive_connections, 'ms_per_reminder': round(naive_seconds * 1000 / naive, 4) if naive else None},
+        'batched': {'reminders': sent, 'ms': round(batched_seconds * 1000, 2), 'queries': batched_queries,
+                    'connections': batched_connections, 'ms_per_reminder': round(batched_seconds * 1000 / sent, 4) if sent else None},
+        'emails_sent': emails,
+        'sent_again': again,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=100000, help='Due reminders to send.')
+    parser.add_argument('--naive', type=int, default=2000, help='Reminders sent by the naive loop, it is slow.')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        results = run(args.appointments, args.naive, args.chunk_size, args.clients)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
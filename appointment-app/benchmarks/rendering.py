@@ -0,0 +1,66 @@
+"""
+Stock serializer + JSONRenderer versus the lean .values() rows + FastJSONRenderer for a list of
+appointments. Checks that both produce the same bytes.
+
+    python -m benchmarks.rendering --rows 10000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.env import setup_django, temporary_database
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(rows=10000, repeat=5):
+    from django.test import override_settings
+    from rest_framework.renderers import JSONRenderer
+    from appointment_app.models import Appointment
+    from appointment_app.renderers import FastJSONRenderer, orjson
+    from appointment_app.serializers import APPOINTMENT_VALUES, AppointmentSerializer, lean_appointments
+    from benchmarks.factories import seed_appointments, seed_times, seed_users
+
+    seed_appointments(seed_users(50), seed_times(rows), rows)
+
+    def stock_serialize():
+        return AppointmentSerializer(Appointment.objects.select_related('times', 'client').order_by('id'), many=True).data
+
+    def lean_serialize():
+        return lean_appointments(Appointment.objects.values(*APPOINTMENT_VALUES).order_by('id'))
+
+    results = {'rows': rows, 'orjson': orjson is not None}
+    with override_settings(APPOINTMENT_FAST_JSON=True):
+        stock_serialize_seconds, stock_data = best_of(repeat, stock_serialize)
+        lean_serialize_seconds, lean_data = best_of(repeat, lean_serialize)
+        stock_render_seconds, stock_bytes = best_of(repeat, lambda: JSONRenderer().render(stock_data))
+        fast_render_seconds, fast_bytes = best_of(repeat, lambda: FastJSONRenderer().render(lean_data))
+    results['identical'] = stock_bytes == fast_bytes
+    results['bytes'] = len(stock_bytes)
+    results['stock'] = {'serialize_ms': round(stock_serialize_seconds * 1000, 1), 'render_ms': round(stock_render_seconds * 1000, 1)}
+    results['fast'] = {'serialize_ms': round(lean_serialize_seconds * 1000, 1), 'render_ms': round(fast_render_seconds * 1000, 1)}
+    results['speedup'] = round((stock_serialize_seconds + stock_render_seconds) / (lean_serialize_seconds + fast_render_seconds), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        results = run(args.rows, args.repeat)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
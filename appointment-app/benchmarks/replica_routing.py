@@ -0,0 +1,127 @@
+"""
+Read-your-writes check for ReplicaRouter, with two SQLite files standing in for a primary and a replica.
+
+The replica is a copy of the primary that is only refreshed when the harness says so, so after a
+write it lags behind like a real replica. Every step records which database the appointment
+queries of a request went to and what the request saw, and the run is correct when the writer
+always sees its own write while other clients read the replica.
+
+    python -m benchmarks.replica_routing
+"""
+import argparse
+import collections
+import json
+import os
+import sqlite3
+import tempfile
+
+from benchmarks.env import setup_django
+
+
+def copy_database(source, target):
+    """
+    Bring the replica up to date with sqlite3's online backup.
+    """
+    source_connection, target_connection = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        source_connection.close()
+        target_connection.close()
+
+
+class QueriedDatabases:
+    """
+    Counts the appointment_app queries sent to each database alias.
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def wrapper(self, alias):
+        def counter(execute, sql, params, many, context):
+            if 'appointment_app_' in sql:
+                self.counts[alias] += 1
+            return execute(sql, params, many, context)
+        return counter
+
+
+def run(primary, replica):
+    import contextlib
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connections
+    from rest_framework.test import APIClient
+    from appointment_app.authentication import ACCESS, issue_token
+    from appointment_app.cache import get_cache
+    from appointment_app.routers import PIN_COOKIE, pin_key
+    from benchmarks.factories import seed_appointments, seed_times
+
+    call_command('migrate', verbosity=0)
+    User = get_user_model()
+    writer = User.objects.create_user('writer', email='writer@example.com', password='bench_pass')
+    reader = User.objects.create_user('reader', email='reader@example.com', password='bench_pass')
+    slot = seed_times(1)[0]
+    seed_appointments([writer], [slot], 1)
+    appointment_id = writer.clients.get().id
+    connections.close_all()
+    copy_database(primary, replica)
+
+    queried = QueriedDatabases()
+    clients = {'writer': APIClient(), 'reader': APIClient(), 'writer_token': APIClient()}
+    clients['writer'].force_login(writer)
+    clients['reader'].force_login(reader)
+    clients['writer_token'].credentials(HTTP_AUTHORIZATION=f'Bearer {issue_token(writer, ACCESS)}')
+    steps = []
+
+    def step(name, client, method='get', path='/appointments/changes/', data=None):
+        queried.counts.clear()
+        with contextlib.ExitStack() as stack:
+            for alias in ('default', 'replica_1'):
+                stack.enter_context(connections[alias].execute_wrapper(queried.wrapper(alias)))
+            response = getattr(clients[client], method)(path, data, format='json')
+        filled = response.data['appointments'][0]['filled'] if path.endswith('changes/') else response.data.get('filled')
+        steps.append({'step': name, 'status': response.status_code, 'database': '+'.join(sorted(queried.counts)), 'filled': filled})
+
+    step('reader_before_write', 'reader')
+    step('writer_writes', 'writer', 'put', f'/appointments/{appointment_id}/',
+         {'times': {'id': slot.id, 'time_start': slot.time_start.isoformat(), 'date_start': slot.date_start.isoformat()}, 'filled': False})
+    step('writer_reads_own_write', 'writer')
+    step('writer_token_reads_own_write', 'writer_token')
+    step('reader_sees_lagging_replica', 'reader')
+    connections.close_all()
+    copy_database(primary, replica)
+    step('reader_after_replication', 'reader')
+    clients['writer'].cookies.pop(PIN_COOKIE)
+    get_cache().delete(pin_key(writer.pk))
+    step('writer_after_pin_expired', 'writer')
+
+    expected = {
+        'reader_before_write': ('replica_1', True),
+        'writer_writes': ('default', False),
+        'writer_reads_own_write': ('default', False),
+        'writer_token_reads_own_write': ('default', False),
+        'reader_sees_lagging_replica': ('replica_1', True),
+        'reader_after_replication': ('replica_1', False),
+        'writer_after_pin_expired': ('replica_1', False),
+    }
+    correct = all((result['database'], result['filled']) == expected[result['step']] and result['status'] == 200 for result in steps)
+    return {'steps': steps, 'correct': correct}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        # the settings read these when Django is set up
+        os.environ['DATABASE_URL'] = f'sqlite:///{primary}'
+        os.environ['DATABASE_REPLICA_URLS'] = f'sqlite:///{replica}'
+        setup_django()
+        from django.test.utils import setup_test_environment
+        setup_test_environment() # testserver host, locmem email
+        print(json.dumps(run(primary, replica), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Slot table size and availability time with pre-generated slots versus schedule templates.
+
+Offers the same calendar both ways, every CHOICES_TIME_START time on every day for --days days,
+first as Times rows made up front by generate_slots and then as one ScheduleTemplate whose slots
+are only saved when booked. Both get the same bookings, then free_slots() is timed over the first
+--window days and the two answers are compared.
+
+    python -m benchmarks.schedule_templates --days 730 --bookings 500
+"""
+import argparse
+import datetime
+import json
+import time
+
+from benchmarks.env import setup_django, temporary_database
+
+FIRST_DATE = datetime.date(2030, 1, 1)
+
+
+def booked_slots(days, bookings):
+    from appointment_app.models import CHOICES_TIME_START
+
+    start_times = sorted(time_start for time_start, _ in CHOICES_TIME_START)
+    # spread over the calendar, so the availability window sees some of them
+    step = max(days * len(start_times) // bookings, 1)
+    slots = [(FIRST_DATE + datetime.timedelta(days=index // len(start_times)), start_times[index % len(start_times)])
+             for index in range(0, days * len(start_times), step)]
+    return slots[:bookings]
+
+
+def time_availability(window, repeat):
+    from appointment_app.availability import free_slots
+
+    date_to = FIRST_DATE + datetime.timedelta(days=window - 1)
+    free_slots(FIRST_DATE, date_to) # warm up, loads the templates into the cache
+    started = time.perf_counter()
+    for _ in range(repeat):
+        free = free_slots(FIRST_DATE, date_to)
+    elapsed = time.perf_counter() - started
+    return [(slot.date_start.isoformat(), slot.time_start.isoformat()) for slot in free], elapsed / repeat
+
+
+def run(days=730, bookings=500, window=92, repeat=20):
+    from django.db import transaction
+    from appointment_app.models import CHOICES_TIME_START, Appointment, ScheduleTemplate, Times
+    from appointment_app.schedules import materialize_slot
+    from appointment_app.slots import generate_slots
+    from benchmarks.factories import seed_users
+
+    user = seed_users(1)[0]
+    slots = booked_slots(days, bookings)
+    results = {}
+
+    generate_slots(FIRST_DATE, FIRST_DATE + datetime.timedelta(days=days - 1))
+    by_start = {(row.date_start, row.time_start): row for row in Times.objects.all()}
+    Appointment.objects.bulk_create([Appointment(times=by_start[slot], client=user) for slot in slots])
+    pregenerated, seconds = time_availability(window, repeat)
+    results['pregenerated'] = {'times_rows': Times.objects.count(), 'availability_ms': round(seconds * 1000, 2)}
+
+    Times.objects.all().delete()
+    ScheduleTemplate.objects.create(name='Every day', weekdays='0,1,2,3,4,5,6', valid_from=FIRST_DATE,
+                                    valid_until=FIRST_DATE + datetime.timedelta(days=days - 1),
+                                    start_times=','.join(time_start.strftime('%H:%M') for time_start, _ in CHOICES_TIME_START))
+    for date_start, time_start in slots:
+        with transaction.atomic():
+            Appointment.objects.create(times=materialize_slot(date_start, time_start), client=user)
+    templates, seconds = time_availability(window, repeat)
+    results['templates'] = {'times_rows': Times.objects.count(), 'availability_ms': round(seconds * 1000, 2)}
+
+    results['same_availability'] = pregenerated == templates
+    results['free_slots_in_window'] = len(templates)
+    results['rows_saved'] = results['pregenerated']['times_rows'] - results['templates']['times_rows']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=730, help='Length of the calendar that is offered.')
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--window', type=int, default=92, help='Days per availability query.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed availability queries per setup.')
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        results = run(args.days, args.bookings, args.window, args.repeat)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()